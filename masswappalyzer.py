@@ -7,7 +7,7 @@ import os
 import subprocess
 import json
 import shlex
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 import tempfile
 import functools
@@ -17,6 +17,51 @@ import shutil
 import csv
 import copy
 import traceback
+import time
+import threading
+import queue
+import itertools
+import math
+import posixpath
+import contextlib
+import atexit
+import uuid
+import signal
+import asyncio
+import contextvars
+import hashlib
+import pkgutil
+import pickle
+import warnings
+import sys
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    from re import _parser as sre_parse, _compiler as sre_compile
+except ImportError:
+    import sre_parse, sre_compile
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+try:
+    import re2
+except ImportError:
+    re2 = None
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
 
 import pandas as pd
 import xlsxwriter
@@ -139,6 +184,305 @@ def async_do(func, data, func_args=None, asynch=False,  workers=None , progress=
                 returned.append(func(index_or_item))
         return(returned)
 
+def asyncio_do(func, data, workers, progress=False, desc='Loading...', finalize=None):
+        """
+        Same as `async_do` with `asynch=True`, but all the work is done on a single event loop thread.  
+        Parameters:  
+        
+        - `func`: Coroutine function. func is going to be called like `func(item)` on all items in data.
+        - `data`: Call func on each element if the list.
+        - `workers`: maximum number of coroutines running at the same time.
+        - `progress`: to show progress bar with ETA (if tqdm installed).  
+        - `desc`: Message to print if progress=True  
+        - `finalize`: Coroutine function awaited on the event loop once all items are done, ex: to close connections. 
+        Returns a list of returned results
+        """
+        async def _do_all():
+            semaphore = asyncio.Semaphore(workers)
+            progress_bar = tqdm.tqdm(desc=desc, total=len(data)) if progress else None
+            async def _do(item):
+                async with semaphore:
+                    result = await func(item)
+                if progress_bar:
+                    progress_bar.update()
+                return result
+            try:
+                return await asyncio.gather(*(_do(item) for item in data))
+            finally:
+                if progress_bar:
+                    progress_bar.close()
+                if finalize:
+                    await finalize()
+        return asyncio.run(_do_all())
+
+class AdaptiveBatcher:
+    """
+    Hand out consecutive chunks of a list, the chunk size adapts so a chunk takes about `target` seconds to process.  
+    Thread safe. 
+    """
+    def __init__(self, data:list, initial:int=4, maximum:int=64, target:float=60) -> None:
+        self.data = data
+        self.size = max(1, min(initial, maximum))
+        self.maximum = maximum
+        self.target = target
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def next_batch(self) -> Tuple[int, list]:
+        """
+        Return the index of the first item and the items of the next chunk, empty list when all items are handed out. 
+        """
+        with self._lock:
+            start = self._position
+            self._position += self.size
+            return start, self.data[start:self._position]
+
+    def record(self, size:int, elapsed:float) -> None:
+        """
+        Adapt the chunk size after a chunk of `size` items took `elapsed` seconds. 
+        Failing chunks are slow (timeouts, session restarts), so they make the next chunks smaller. 
+        """
+        per_item = max(elapsed / max(size, 1), 0.001)
+        with self._lock:
+            # Grow at most twice at a time
+            self.size = max(1, min(self.maximum, int(self.target / per_item), self.size * 2))
+
+def batch_do(func, batcher:AdaptiveBatcher, workers:int, progress=False, desc='Loading...'):
+        """
+        Call func on chunks of items handed out by the batcher, using `workers` threads.  
+        Parameters:  
+        
+        - `func`: Callable function. func is going to be called like `func(items)` and must return one result per item.
+        - `batcher`: `AdaptiveBatcher` over the data.
+        - `workers`: number of threads.
+        - `progress`: to show progress bar with ETA (if tqdm installed).  
+        - `desc`: Message to print if progress=True  
+        Returns a list of returned results, one per item, in the order of the data
+        """
+        returned: list = [ None ] * len(batcher.data)
+        # Set on error or Ctrl-C: the workers stop after their current chunk
+        stop = threading.Event()
+        progress_bar = tqdm.tqdm(desc=desc, total=len(batcher.data)) if progress else None
+        def _worker():
+            while not stop.is_set():
+                start, items = batcher.next_batch()
+                if not items:
+                    return
+                began = time.monotonic()
+                returned[start:start+len(items)] = func(items)
+                batcher.record(len(items), time.monotonic() - began)
+                if progress_bar:
+                    progress_bar.update(len(items))
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            for future in [ executor.submit(_worker) for _ in range(workers) ]:
+                future.result()
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            # Don't wait for the chunks in progress when interrupted
+            executor.shutdown(wait=not stop.is_set())
+            if progress_bar:
+                progress_bar.close()
+        return returned
+
+class MicroBatcher:
+    """
+    Combine the calls made at the same time by several threads into batches: a caller that finds less than `concurrency`
+    batches running takes the pending items, up to `maximum`, and calls `func` on them for all their callers.
+    Callers never wait for a batch to fill, a caller alone runs a batch of one. Thread safe.
+    """
+    def __init__(self, func, maximum:int, concurrency:int=1) -> None:
+        self.func = func
+        self.maximum = maximum
+        self.concurrency = concurrency
+        self._pending: List[Tuple[Any, concurrent.futures.Future]] = []
+        self._running = 0
+        self._done = threading.Condition()
+
+    def __call__(self, item):
+        """
+        Return the result of `func` for the item, or raise its exception.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._done:
+            self._pending.append((item, future))
+        while True:
+            with self._done:
+                while not future.done() and self._running >= self.concurrency:
+                    self._done.wait()
+                if future.done():
+                    return future.result()
+                self._running += 1
+                batch = self._pending[:self.maximum]
+                del self._pending[:self.maximum]
+            try:
+                results = self.func([ item for item, _ in batch ])
+                for (_, f), result in zip(batch, results):
+                    f.set_result(result)
+            except BaseException as e:
+                for _, f in batch:
+                    if not f.done():
+                        f.set_exception(e)
+            finally:
+                with self._done:
+                    self._running -= 1
+                    self._done.notify_all()
+
+class PipelineStats:
+    """
+    Queue depth and waiting times of a `pipeline_do()` run, to tell which stage is the bottleneck: 
+    producers blocked on a full queue mean the consumers are too slow, consumers idle on an empty queue mean the producers are. 
+    Thread safe. 
+    """
+    def __init__(self, size:int) -> None:
+        self.size = size
+        self.items = 0
+        self.depth_sum = 0
+        self.depth_max = 0
+        # Seconds spent by the producers waiting for a free slot, and by the consumers waiting for an item
+        self.blocked = 0.0
+        self.idle = 0.0
+        # Number of calls of the consume function
+        self.batches = 0
+        self.producers = 0
+        self.consumers = 0
+        self.began = time.monotonic()
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def put(self, depth:int, waited:float) -> None:
+        with self._lock:
+            self.items += 1
+            self.depth_sum += depth
+            self.depth_max = max(self.depth_max, depth)
+            self.blocked += waited
+
+    def got(self, waited:float) -> None:
+        with self._lock:
+            self.idle += waited
+
+    def consumed(self) -> None:
+        with self._lock:
+            self.batches += 1
+
+    def __str__(self) -> str:
+        mean = self.depth_sum / self.items if self.items else 0
+        blocked = self.blocked / (self.elapsed * self.producers) * 100 if self.elapsed and self.producers else 0
+        idle = self.idle / (self.elapsed * self.consumers) * 100 if self.elapsed and self.consumers else 0
+        batch = self.items / self.batches if self.batches else 0
+        return (f"{self.items} items in {self.elapsed:.1f}s, queue depth mean {mean:.1f} max {self.depth_max}/{self.size}, "
+            f"{self.producers} producers blocked {blocked:.0f}% of the time, {self.consumers} consumers idle {idle:.0f}% of the time, "
+            f"mean batch {batch:.1f}")
+
+def pipeline_do(produce, consume, data, producers:int, consumers:int, size:int, batch:int=1, progress=False, desc='Loading...', 
+                stats:Optional[PipelineStats]=None):
+        """
+        Run two stages on the data: `producers` threads call produce on each item and put the result in a queue of `size` items, 
+        `consumers` threads take them out and call consume. Each stage is scaled on its own, ex: I/O-bound downloads and CPU-bound analyses.  
+        Parameters:  
+        
+        - `produce`: Callable function. produce is going to be called like `produce(item)` on all items in data.
+        - `consume`: Callable function. consume is going to be called like `consume(items, produced)` with lists of the items waiting 
+            in the queue, up to `batch`, and must return one result per item.
+        - `data`: Call the functions on each element if the list.
+        - `producers`, `consumers`: number of threads of each stage.
+        - `size`: maximum number of produced items waiting for a consumer.
+        - `batch`: maximum number of items passed to consume at once. Consumers don't wait for a batch to fill up.
+        - `progress`: to show progress bar with ETA (if tqdm installed), with the queue depth.  
+        - `desc`: Message to print if progress=True  
+        - `stats`: `PipelineStats` filled during the run.
+        Returns a list of the results of consume, in the order of the data. 
+        The first exception raised by a stage stops the run and is raised once the started items are done. 
+        """
+        returned: list = [ None ] * len(data)
+        pending: queue.Queue = queue.Queue(maxsize=size)
+        stats = stats or PipelineStats(size)
+        stats.producers, stats.consumers = producers, consumers
+        items = iter(enumerate(data))
+        lock = threading.Lock()
+        # Set on the first error: no new item is produced, the queued ones are dropped
+        stop = threading.Event()
+        # Set when the producers are finished: the consumers return once the queue is empty
+        done = threading.Event()
+        errors: List[BaseException] = []
+        progress_bar = tqdm.tqdm(desc=desc, total=len(data)) if progress else None
+        def _producer():
+            while not stop.is_set():
+                with lock:
+                    index, item = next(items, (None, None))
+                if index is None:
+                    return
+                try:
+                    produced = produce(item)
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+                    return
+                began = time.monotonic()
+                pending.put((index, item, produced))
+                stats.put(pending.qsize(), time.monotonic() - began)
+        def _consumer():
+            while True:
+                began = time.monotonic()
+                try:
+                    entries = [ pending.get(timeout=0.1) ]
+                except queue.Empty:
+                    if done.is_set():
+                        return
+                    continue
+                finally:
+                    stats.got(time.monotonic() - began)
+                while len(entries) < batch:
+                    try:
+                        entries.append(pending.get_nowait())
+                    except queue.Empty:
+                        break
+                if stop.is_set():
+                    continue
+                stats.consumed()
+                indexes, items, produced = zip(*entries)
+                try:
+                    for index, result in zip(indexes, consume(list(items), list(produced))):
+                        returned[index] = result
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+                if progress_bar:
+                    progress_bar.update(len(entries))
+                    progress_bar.set_postfix(queue=pending.qsize(), refresh=False)
+        producing = concurrent.futures.ThreadPoolExecutor(max_workers=producers)
+        consuming = concurrent.futures.ThreadPoolExecutor(max_workers=consumers)
+        try:
+            for _ in range(consumers):
+                consuming.submit(_consumer)
+            for future in [ producing.submit(_producer) for _ in range(producers) ]:
+                future.result()
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            producing.shutdown()
+            done.set()
+            consuming.shutdown()
+            stats.elapsed = time.monotonic() - stats.began
+            if progress_bar:
+                progress_bar.close()
+        if errors:
+            raise errors[0]
+        return returned
+
+def shutdown_executor(executor:concurrent.futures.Executor, wait:bool=True) -> None:
+    """
+    Shut the executor down, cancelling the calls that haven't started. 
+    `cancel_futures` needs Python 3.9: before, the queued calls still run. 
+    """
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=wait, cancel_futures=True)
+    else:
+        executor.shutdown(wait=wait)
+
 def file_to_list(path):
     the_list=list()
     with open(path , 'r', encoding='utf-8') as the_file:
@@ -148,65 +492,2149 @@ def file_to_list(path):
                 the_list.append(item)
     return(the_list)
 
-def ensure_scheme(url:str) -> str:
-    # Strip URL string
-    url=url.strip()
-    # Format URL with scheme indication if not already present
-    p_url=list(urlparse(url))
-    if p_url[0]=="": 
-        url='http://'+url
-    return url
+def ensure_scheme(url:str) -> str:
+    # Strip URL string
+    url=url.strip()
+    # Format URL with scheme indication if not already present
+    p_url=list(urlparse(url))
+    if p_url[0]=="": 
+        url='http://'+url
+    return url
+
+class LatencySketch:
+    """
+    Streaming quantile sketch of latencies: counts in logarithmic buckets, so quantiles have a relative error of `gamma - 1`. 
+    Thread safe. 
+    """
+    def __init__(self, gamma:float=1.05, minimum:float=0.001) -> None:
+        self.gamma = gamma
+        self.minimum = minimum
+        self.count = 0
+        self._buckets: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, seconds:float) -> None:
+        index = math.ceil(math.log(max(seconds, self.minimum) / self.minimum, self.gamma))
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+
+    def quantile(self, q:float) -> Optional[float]:
+        """
+        Return the upper bound of the bucket holding the q-quantile, None if nothing was added. 
+        """
+        with self._lock:
+            rank = q * self.count
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= rank:
+                    return self.minimum * self.gamma ** index
+        return None
+
+class TimeoutPolicy:
+    """
+    Timeouts of the analysis phases: 'connect', 'first_byte' and 'total', in seconds. 
+    
+    Each phase has a ceiling and a floor. Until `min_samples` latencies of a phase are observed, or if `adaptive` is False, 
+    its timeout is the initial one (the ceiling by default). Otherwise it's the `quantile` of the observed latencies times `factor`, 
+    between the floor and the ceiling. 
+    """
+    def __init__(self, ceilings:Dict[str, float], floors:Optional[Dict[str, float]]=None, initial:Optional[Dict[str, float]]=None, 
+                 adaptive:bool=False, quantile:float=0.99, factor:float=3, min_samples:int=20) -> None:
+        self.ceilings = ceilings
+        self.floors = floors or {}
+        self.initial = initial or {}
+        self.adaptive = adaptive
+        self.quantile = quantile
+        self.factor = factor
+        self.min_samples = min_samples
+        self.sketches: Dict[str, LatencySketch] = { phase: LatencySketch() for phase in ceilings }
+
+    def get(self, phase:str) -> float:
+        ceiling = self.ceilings[phase]
+        sketch = self.sketches[phase]
+        if not self.adaptive or sketch.count < self.min_samples:
+            return min(self.initial.get(phase, ceiling), ceiling)
+        return max(self.floors.get(phase, 0), min(ceiling, sketch.quantile(self.quantile) * self.factor))
+
+    def observe(self, phase:str, seconds:float) -> None:
+        """
+        Record the latency of a phase that completed. 
+        """
+        if phase in self.sketches:
+            self.sketches[phase].add(seconds)
+
+    def set_longest(self) -> None:
+        """
+        Use the ceilings from now on, to retry the timed out analyses. 
+        """
+        self.adaptive = False
+        self.initial = {}
+
+
+def fold(text:str) -> str:
+    """
+    Lower case the text so that a case-insensitive regex matches an ASCII literal only if the folded text contains it. 
+    """
+    # Other characters than the ASCII letters' cases that match them with re.I, 'K' (Kelvin sign) is lowered to 'k'. 
+    # 'İ' is lowered to 'i' and a combining dot, it is replaced first. 
+    return text.replace('İ', 'i').lower().replace('ı', 'i').replace('ſ', 's')
+
+@functools.lru_cache(maxsize=4096)
+def required_literals(pattern:str, minimum:int=3) -> Optional[List[str]]:
+    """
+    Return folded ASCII literals, one of which occurs in any text the case-insensitive pattern matches, 
+    the longest ones that can be found. None if the pattern has no required literal of at least `minimum` characters. 
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.I)
+    except Exception:
+        return None
+    literals = _required_literals(parsed, minimum)
+    return sorted(literals) if literals else None
+
+def _required_literals(parsed, minimum:int):
+    best = None
+    run: List[str] = []
+    def consider(literals) -> None:
+        nonlocal best
+        if literals and (best is None or min(map(len, literals)) > min(map(len, best))):
+            best = literals
+    def flush() -> None:
+        if len(run) >= minimum:
+            consider(frozenset([fold(''.join(run))]))
+        run.clear()
+    for op, av in parsed:
+        if op is sre_parse.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is sre_parse.SUBPATTERN:
+            consider(_required_literals(av[-1], minimum))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            consider(_required_literals(av[2], minimum))
+        elif op is sre_parse.BRANCH:
+            branches = [ _required_literals(branch, minimum) for branch in av[1] ]
+            if all(branches):
+                consider(frozenset().union(*branches))
+    flush()
+    return best
+
+def portable_pattern(pattern:str) -> Optional[str]:
+    """
+    Translate a case-insensitive pattern to the syntax shared by RE2 and Hyperscan, with the same semantics as the re module 
+    when searching ASCII text. Return None if the pattern uses constructs that can't be translated: 
+    lookarounds, back references, '$' anywhere but at the end, possessive or atomic groups or flags. 
+    Capturing groups become non-capturing, the translation only tells whether the pattern matches. 
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.I)
+    except Exception:
+        return None
+    if parsed.state.flags != sre_parse.parse('', re.I).state.flags:
+        return None
+    try:
+        return _portable(parsed, tail=True)
+    except ValueError:
+        return None
+
+@functools.lru_cache(maxsize=4096)
+def _portable_class(op, av) -> str:
+    """
+    Return a class of the ASCII characters that a single character element of a parsed pattern matches with re.I. 
+    """
+    if op is sre_parse.LITERAL and av < 128:
+        return chr(av) if chr(av).isalnum() else f'\\x{av:02x}'
+    element = sre_parse.SubPattern(sre_parse.parse('', re.I).state, [(op, list(av) if isinstance(av, tuple) else av)])
+    regex = sre_compile.compile(element, re.I)
+    chars = [ c for c in range(128) if regex.match(chr(c)) ]
+    if not chars:
+        # Never matches ASCII text
+        return '[^\\x00-\\x7f]'
+    ranges = []
+    for _, group in itertools.groupby(enumerate(chars), key=lambda item: item[1] - item[0]):
+        group = [ c for _, c in group ]
+        ranges.append(f'\\x{group[0]:02x}' + (f'-\\x{group[-1]:02x}' if len(group) > 1 else ''))
+    return '[{}]'.format(''.join(ranges))
+
+def _portable(parsed, tail:bool) -> str:
+    """
+    Translate a parsed pattern, `tail` tells whether nothing can be matched after it. 
+    """
+    out = []
+    for position, (op, av) in enumerate(parsed):
+        last = tail and position == len(parsed) - 1
+        if op in (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.CATEGORY):
+            out.append(_portable_class(op, av))
+        elif op is sre_parse.IN:
+            out.append(_portable_class(op, tuple(av)))
+        elif op is sre_parse.ANY:
+            out.append('.')
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, sub = av
+            bound = f'{{{low},}}' if high is sre_parse.MAXREPEAT else f'{{{low},{high}}}'
+            out.append('(?:{}){}'.format(_portable(sub, tail=False), bound))
+        elif op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            out.append('(?:{})'.format(_portable(av[-1], tail=last)))
+        elif op is sre_parse.BRANCH:
+            out.append('(?:{})'.format('|'.join(_portable(branch, tail=last) for branch in av[1])))
+        elif op is sre_parse.AT and av in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING):
+            out.append('^')
+        elif op is sre_parse.AT and av in (sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY):
+            out.append('\\b' if av is sre_parse.AT_BOUNDARY else '\\B')
+        elif op is sre_parse.AT and av is sre_parse.AT_END and last:
+            # '$' matches at the end and before a newline at the end
+            out.append('(?:\\n?\\z)')
+        elif op is sre_parse.AT and av is sre_parse.AT_END_STRING and last:
+            out.append('\\z')
+        else:
+            raise ValueError(op)
+    return ''.join(out)
+
+class RegexEngine:
+    """
+    Finds which fingerprint patterns match a text. This one leaves everything to the re module: `compile_set()` returns None. 
+    
+    Other engines compile the patterns `portable_pattern()` can translate into a set that is searched in a single, 
+    linear-time pass without holding the GIL. They only tell whether the patterns match, versions are extracted with re. 
+    """
+    name = 're'
+
+    def compile_set(self, patterns:List[str]) -> Optional['CompiledSet']:
+        return None
+
+class CompiledSet:
+    """
+    Patterns compiled by a `RegexEngine`. 
+    """
+    def __init__(self, patterns:List[str]) -> None:
+        # The patterns that are searched by the engine, the others must be searched with re
+        self.patterns = patterns
+
+    def match(self, data:bytes) -> set:
+        """
+        Return the patterns that match the ASCII encoded text. 
+        """
+        raise NotImplementedError()
+
+class Re2Set(CompiledSet):
+
+    def __init__(self, patterns:List[str], size:int=200) -> None:
+        options = re2.Options()
+        options.case_sensitive = False
+        options.max_mem = 256 << 20
+        self._sets: List[Tuple['re2.Set', List[str]]] = []
+        compiled = []
+        for pattern in patterns:
+            portable = portable_pattern(pattern)
+            if portable is None:
+                continue
+            if not self._sets or len(self._sets[-1][1]) >= size:
+                self._sets.append((re2.Set.SearchSet(options), []))
+            try:
+                self._sets[-1][0].Add(portable)
+            except re2.error:
+                continue
+            self._sets[-1][1].append(pattern)
+            compiled.append(pattern)
+        for regexes, _ in self._sets:
+            regexes.Compile()
+        super().__init__(compiled)
+
+    def match(self, data:bytes) -> set:
+        found = set()
+        for regexes, patterns in self._sets:
+            found.update(patterns[i] for i in regexes.Match(data) or ())
+        return found
+
+class Re2Engine(RegexEngine):
+    name = 're2'
+
+    def __init__(self) -> None:
+        if not re2:
+            print("Please install google-re2.")
+            exit(1)
+
+    def compile_set(self, patterns:List[str]) -> Optional[CompiledSet]:
+        return Re2Set(patterns)
+
+class HyperscanSet(CompiledSet):
+
+    FLAGS = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_ALLOWEMPTY if hyperscan else 0
+
+    def __init__(self, patterns:List[str]) -> None:
+        portable = [ (p, t) for p, t in zip(patterns, map(portable_pattern, patterns)) if t is not None ]
+        try:
+            self._database = self._compile([ t for _, t in portable ])
+        except hyperscan.error:
+            # Leave the patterns Hyperscan does not support to re
+            portable = [ (p, t) for p, t in portable if self._compiles(t) ]
+            self._database = self._compile([ t for _, t in portable ])
+        super().__init__([ p for p, _ in portable ])
+        # Scratch space can't be shared between threads
+        self._local = threading.local()
+
+    @classmethod
+    def _compile(cls, expressions:List[str]) -> Optional['hyperscan.Database']:
+        if not expressions:
+            return None
+        database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        database.compile(expressions=[ e.encode() for e in expressions ], ids=list(range(len(expressions))), 
+            elements=len(expressions), flags=cls.FLAGS)
+        return database
+
+    @classmethod
+    def _compiles(cls, expression:str) -> bool:
+        try:
+            cls._compile([expression])
+            return True
+        except hyperscan.error:
+            return False
+
+    def match(self, data:bytes) -> set:
+        if not self._database:
+            return set()
+        scratch = getattr(self._local, 'scratch', None)
+        if not scratch:
+            scratch = self._local.scratch = hyperscan.Scratch(self._database)
+        found = set()
+        def on_match(id:int, start:int, end:int, flags:int, context) -> None:
+            found.add(self.patterns[id])
+        self._database.scan(data, match_event_handler=on_match, scratch=scratch)
+        return found
+
+class HyperscanEngine(RegexEngine):
+    name = 'hyperscan'
+
+    def __init__(self) -> None:
+        if not hyperscan:
+            print("Please install hyperscan.")
+            exit(1)
+
+    def compile_set(self, patterns:List[str]) -> Optional[CompiledSet]:
+        return HyperscanSet(patterns)
+
+REGEX_ENGINES = {'re': RegexEngine, 're2': Re2Engine, 'hyperscan': HyperscanEngine}
+
+class LiteralScanner:
+    """
+    Find which of many literals occur in a text in a single pass: with an Aho-Corasick automaton if pyahocorasick is installed, 
+    or else with a trie-shaped regex matched at every position, which finds the longest literal starting at each position. 
+    """
+    def __init__(self, literals:List[str]) -> None:
+        self.literals = sorted(set(literals))
+        if ahocorasick:
+            self._automaton = ahocorasick.Automaton()
+            for literal in self.literals:
+                self._automaton.add_word(literal, literal)
+            if self.literals:
+                self._automaton.make_automaton()
+        else:
+            # literal -> literals it starts with, found at the same position
+            self._prefixes = { literal: [ l for l in self.literals if literal.startswith(l) ] for literal in self.literals }
+            self._regex = re.compile('(?=({}))'.format(self._trie_regex(self.literals))) if self.literals else None
+
+    @classmethod
+    def _trie_regex(cls, literals:List[str]) -> str:
+        """
+        Return a regex matching the literals, preferring the longest. Literals must be sorted. 
+        """
+        if len(literals) == 1:
+            return re.escape(literals[0])
+        branches = []
+        for char, group in itertools.groupby(literals, key=lambda l: l[0]):
+            suffixes = [ l[1:] for l in group ]
+            tails = [ t for t in suffixes if t ]
+            branch = re.escape(char)
+            if tails and len(tails) < len(suffixes):
+                branch += '(?:{})?'.format(cls._trie_regex(tails))
+            elif tails:
+                branch += cls._trie_regex(tails)
+            branches.append(branch)
+        return branches[0] if len(branches) == 1 else '(?:{})'.format('|'.join(branches))
+
+    def find(self, text:str) -> set:
+        """
+        Return the literals that occur in the text. 
+        """
+        if not self.literals:
+            return set()
+        if ahocorasick:
+            return { literal for _, literal in self._automaton.iter(text) }
+        found = set()
+        for longest in set(self._regex.findall(text)):
+            found.update(self._prefixes[longest])
+        return found
+
+class PatternSet:
+    """
+    Case-insensitive patterns searched in the same texts with a few combined alternation regexes, 
+    `(?P<_0>pattern0)|(?P<_1>pattern1)|...` of at most `size` patterns, instead of one search per pattern. 
+    
+    A scan reports the patterns whose alternative matched first at some position: these patterns match. 
+    A chunk that does not match at all means none of its patterns match. The other patterns of a chunk that matched 
+    are searched on their own, as are the patterns that can't be combined (back references, named groups or global flags). 
+    
+    ASCII texts are searched with the set compiled by the `RegexEngine` first, only the patterns it can't express 
+    are searched with re. 
+    """
+    def __init__(self, patterns:List[str], regex=None, size:int=100, engine:Optional[RegexEngine]=None) -> None:
+        # Compiles a single pattern
+        self.regex = regex or (lambda pattern: re.compile(pattern, re.I))
+        self.engine = engine or RegexEngine()
+        self._engine_set: Optional[CompiledSet] = None
+        self.engine_patterns: set = set()
+        self._engine_lock = threading.Lock()
+        self.patterns = set(patterns)
+        combinable = [ p for p in patterns if self.combinable(p) ]
+        self.chunks = [ combinable[i:i + size] for i in range(0, len(combinable), size) ]
+        self.single = set(patterns) - set(combinable)
+        self._members = [ set(chunk) for chunk in self.chunks ]
+        self._combined: Dict[int, Optional['re.Pattern']] = {}
+
+    @staticmethod
+    def combinable(pattern:str) -> bool:
+        try:
+            parsed = sre_parse.parse(pattern, re.I)
+        except Exception:
+            return False
+        if parsed.state.groupdict or parsed.state.flags != sre_parse.parse('', re.I).state.flags:
+            return False
+        def refs(node) -> bool:
+            if isinstance(node, sre_parse.SubPattern):
+                return any(op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS) or refs(av) for op, av in node)
+            if isinstance(node, (tuple, list)):
+                return any(refs(item) for item in node)
+            return False
+        return not refs(parsed)
+
+    def combined(self, index:int) -> Optional['re.Pattern']:
+        """
+        Return the combined regex of a chunk, None if it can't be compiled. 
+        """
+        if index not in self._combined:
+            try:
+                self._combined[index] = re.compile('|'.join(f'(?P<_{i}>{p})' for i, p in enumerate(self.chunks[index])), re.I)
+            except (re.error, RecursionError, OverflowError):
+                self._combined[index] = None
+        return self._combined[index]
+
+    def engine_set(self) -> Optional[CompiledSet]:
+        """
+        Return the patterns compiled by the engine, compiled the first time. 
+        """
+        if self._engine_set is None:
+            with self._engine_lock:
+                if self._engine_set is None:
+                    compiled = self.engine.compile_set(list(self.patterns))
+                    self.engine_patterns = set(compiled.patterns) if compiled else set()
+                    self._engine_set = compiled or CompiledSet([])
+        return self._engine_set
+
+    def search(self, text:str, candidates:Optional[set]=None, combine:bool=True) -> set:
+        """
+        Return the patterns that match the text, among the candidates if given. 
+        """
+        found = set()
+        if text.isascii() and self.engine_set().patterns:
+            if candidates is None:
+                candidates = set(self.patterns)
+            if candidates & self.engine_patterns:
+                found = self._engine_set.match(text.encode('ascii')) & candidates
+            candidates = candidates - self.engine_patterns
+            if not candidates:
+                return found
+        return found | self._search(text, candidates, combine)
+
+    def _search(self, text:str, candidates:Optional[set], combine:bool) -> set:
+        if not combine:
+            todo = self.patterns if candidates is None else self.patterns & candidates
+            return { p for p in todo if self.regex(p).search(text) }
+        found = set()
+        todo = set(self.single) if candidates is None else self.single & candidates
+        for index, chunk in enumerate(self.chunks):
+            members = self._members[index] if candidates is None else self._members[index] & candidates
+            if not members:
+                continue
+            combined = self.combined(index)
+            if combined is None:
+                todo |= members
+                continue
+            hits = { chunk[int(m.lastgroup[1:])] for m in combined.finditer(text) }
+            if hits:
+                found |= hits
+                todo |= members - hits
+        found.update(p for p in todo if self.regex(p).search(text))
+        return found
+
+##### Core
+
+class Technology:
+    """
+    A detected technology.
+    """
+    def __init__(self, url:str, name:str, version:Optional[str]=None, categories:Optional[List[str]]=None) -> None:
+        self.url = url
+        self.name = name
+        self.version: Optional[str] = version
+        self.categories: List[str] = categories or []
+
+class TechnologyFilter:
+    """
+    Allow-list of technology and category names, case insensitive. 
+    """
+    def __init__(self, techs:Optional[List[str]]=None, categories:Optional[List[str]]=None) -> None:
+        self.techs = { name.casefold() for name in techs or () }
+        self.categories = { name.casefold() for name in categories or () }
+
+    def allows(self, name:str, categories:List[str]) -> bool:
+        return name.casefold() in self.techs or any(c.casefold() in self.categories for c in categories)
+
+    def __call__(self, tech:Technology) -> bool:
+        return self.allows(tech.name, tech.categories)
+
+class AnalysisError(Exception):
+    """
+    A host could not be analyzed. The scan goes on and the failure is recorded. 
+    """
+    reason = 'error'
+
+class AnalysisTimeout(AnalysisError):
+    """
+    The analysis timed out. 
+    """
+    reason = 'timeout'
+
+class ResourceLimitExceeded(AnalysisError):
+    """
+    The analysis was killed because it exceeded the output or memory limits. 
+    """
+    reason = 'resource'
+
+class BackendError(AnalysisError):
+    """
+    The analyzer itself failed, ex: a worker could not start or died. The host may be fine. 
+    """
+
+class IWappalyzer:
+    # SHA-256 of the fingerprint database, None if unknown (wappalyzer/cli)
+    fingerprints: Optional[str] = None
+
+    def analyze(self, host) -> List[Technology]:
+        ...
+    
+    async def analyze_async(self, host) -> List[Technology]:
+        """
+        Coroutine version of `analyze()`. Runs `analyze()` in the event loop default executor unless overriden. 
+        The context variables are copied, so `Attempt.current()` is the attempt of the calling task. 
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, self.analyze, host)
+    
+    def analyze_many(self, hosts:List[str]) -> List[Union[List[Technology], AnalysisError]]:
+        """
+        Analyze a batch of hosts, return one list of technologies per host, or the `AnalysisError` if the host could not be analyzed. 
+        Calls `analyze()` on each host unless overriden. 
+        """
+        results: List[Union[List[Technology], AnalysisError]] = []
+        for host in hosts:
+            try:
+                results.append(self.analyze(host))
+            except AnalysisError as e:
+                results.append(e)
+        return results
+    
+    def set_adaptive_timeouts(self, adaptive:bool) -> None:
+        """
+        Enable or disable the timeouts learned from the observed latencies. 
+        """
+        self.timeouts.adaptive = adaptive
+
+    def set_longest_timeouts(self) -> None:
+        """
+        Use the longest timeouts from now on. 
+        """
+        self.timeouts.set_longest()
+
+    @property
+    def truncated(self) -> Dict[str, str]:
+        """
+        Hosts whose page was cut at a size or read time limit -> the limit, their technologies are detected in what was received. 
+        """
+        return {}
+
+    def close(self) -> None:
+        """
+        Release the resources held by the analyzer (processes, containers, sessions). 
+        """
+        pass
+
+    async def aclose(self) -> None:
+        """
+        Release the resources bound to the running event loop (connections of `analyze_async()`). 
+        Awaited before the event loop closes, the analyzer can still be used afterwards. 
+        """
+        pass
+
+class FingerprintDB:
+    """
+    On-disk cache of the Wappalyzer technologies database used by python-Wappalyzer. 
+    
+    Each downloaded database is stored under the SHA-256 of its content, the `current` file points to the one in use 
+    and its modification time is the time of the download. The database is downloaded again when it's older than `ttl` hours. 
+    Its index is saved next to it, under the same hash, so a start only reads the `current` file and the index. 
+    In `offline` mode nothing is downloaded: the cached database is used whatever its age, or the one bundled with python-Wappalyzer. 
+    """
+    # Same source as python-Wappalyzer's Wappalyzer.latest(update=True)
+    URL = 'https://raw.githubusercontent.com/AliasIO/wappalyzer/master/src/technologies.json'
+
+    def __init__(self, cache_dir:Optional[str]=None, url:Optional[str]=None, ttl:float=24, offline:bool=False) -> None:
+        self.cache_dir = os.path.join(cache_dir or os.path.join(
+            os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'masswappalyzer'), 'fingerprints')
+        self.url = url or self.URL
+        self.ttl = ttl
+        self.offline = offline
+
+    @property
+    def _current(self) -> str:
+        return os.path.join(self.cache_dir, 'current')
+
+    def path(self, digest:str) -> str:
+        return os.path.join(self.cache_dir, f'{digest}.json')
+
+    def index_path(self, digest:str) -> str:
+        return os.path.join(self.cache_dir, f'{digest}.index-{FingerprintIndex.FORMAT}.pickle')
+
+    def cached(self) -> Optional[Tuple[str, float]]:
+        """
+        Return the hash and age in hours of the cached database, None if there is no cached database. 
+        The database is not read, its content is checked against the hash by `_read()`. 
+        """
+        try:
+            with open(self._current) as f:
+                digest = f.read().strip()
+            age = (time.time() - os.path.getmtime(self._current)) / 3600
+        except OSError:
+            return None
+        if not os.path.isfile(self.path(digest)) and not os.path.isfile(self.index_path(digest)):
+            return None
+        return digest, age
+
+    def _read(self, digest:str) -> Optional[bytes]:
+        """
+        Return the content of a cached database, None if it's missing or corrupted. 
+        """
+        try:
+            with open(self.path(digest), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            print(f"Ignoring corrupted fingerprint database {self.path(digest)}")
+            return None
+        return data
+
+    def _store(self, data:bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for path, content in ((self.path(digest), data), (self._current, digest.encode())):
+            # Atomic writes, other scans may read the cache at the same time
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp, path)
+        return digest
+
+    def refresh(self) -> str:
+        """
+        Download the database and make it the current one. Return its hash. 
+        """
+        if os.path.isfile(self.url):
+            with open(self.url, 'rb') as f:
+                data = f.read()
+        else:
+            import requests
+            response = requests.get(self.url, timeout=30)
+            response.raise_for_status()
+            data = response.content
+        obj = json.loads(data)
+        if not isinstance(obj, dict) or 'technologies' not in obj or 'categories' not in obj:
+            raise ValueError(f"{self.url} is not a Wappalyzer technologies database")
+        return self._store(data)
+
+    def _select(self) -> Tuple[str, Optional[bytes]]:
+        """
+        Return the hash of the database to use, downloading it first if the cache is missing or expired, 
+        and the content of the database bundled with python-Wappalyzer if it's the one to use. 
+        """
+        cached = self.cached()
+        if not self.offline and (not cached or cached[1] >= self.ttl):
+            try:
+                digest = self.refresh()
+            except Exception as e:
+                print(f"Could not update the fingerprint database from {self.url}: {e}")
+            else:
+                cached = (digest, 0)
+        if cached:
+            return cached[0], None
+        print("Using the fingerprint database bundled with python-Wappalyzer")
+        data = pkgutil.get_data('Wappalyzer', 'data/technologies.json')
+        return hashlib.sha256(data).hexdigest(), data
+
+    def index(self) -> Tuple['FingerprintIndex', str]:
+        """
+        Return the compiled index of the database and its hash. 
+        The index is built once per database and saved next to it. 
+        """
+        digest, data = self._select()
+        path = self.index_path(digest)
+        try:
+            return FingerprintIndex.load(path), digest
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Rebuilding the fingerprint index {path}: {e}")
+        if data is None:
+            data = self._read(digest)
+        if data is None:
+            # Forget it, the database is downloaded again or the bundled one is used
+            with contextlib.suppress(OSError):
+                os.remove(self._current)
+            return self.index()
+        index = FingerprintIndex.build(json.loads(data))
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"Could not save the fingerprint index {path}: {e}")
+        return index, digest
+
+class FingerprintIndex:
+    """
+    Compiled form of a Wappalyzer technologies database, detecting technologies like python-Wappalyzer does. 
+    
+    The database is normalized once: patterns are split from their version templates, implies are resolved and 
+    category ids are mapped to names. The index holds only strings, lists and dicts so it's pickled and loaded quickly, 
+    regexes are compiled the first time they are used. 
+    
+    The required literals of the patterns of each field of the page (url, headers, scripts, meta, html) are found with 
+    one `LiteralScanner` pass per field, only the patterns whose literals occur, or that have none, are evaluated. 
+    
+    Same semantics as python-Wappalyzer's `Wappalyzer.analyze_with_versions_and_categories()`: a technology is detected 
+    when a headers, scripts, meta or html pattern matches, url patterns only add versions. 
+    Versions are sorted from the shortest to the longest. Excludes are not applied. 
+    Unlike python-Wappalyzer, detection state does not leak from a page to the next. 
+    """
+    # Changes when the layout of the index changes
+    FORMAT = 3
+
+    FIELDS = ('url', 'headers', 'scripts', 'meta', 'html')
+    # Fields matched with combined regexes, one scan per value. With the re module, an alternation is slower than searching 
+    # the literal prefiltered patterns one by one in the html and script URLs, as it can't skip to a literal prefix. 
+    COMBINED_FIELDS = ('url', 'headers', 'meta')
+    # Fields taken from the body of the page
+    BODY_FIELDS = ('scripts', 'meta', 'html')
+    # Fields whose values repeat across pages (Server: nginx, jQuery from a CDN), matched once per batch by analyze_many()
+    SHARED_FIELDS = ('headers', 'scripts', 'meta')
+    
+    # Regex that never matches, for invalid patterns
+    NEVER = re.compile(r'(?!x)x')
+
+    def __init__(self, technologies:Dict[str, dict], categories:Dict[str, str], prefilter:Dict[str, dict], 
+                 allowed:Optional[set]=None) -> None:
+        # name -> {'url': [(regex, version)], 'headers': {name: (regex, version)}, 'scripts': [...], 'meta': {...}, 'html': [...], 
+        #   'implies': [name], 'excludes': [name], 'cats': [category name]}
+        self.technologies = technologies
+        # category id -> name
+        self.categories = categories
+        # field -> {'literals': {literal: [regex]}, 'unfiltered': [regex], 'techs': {regex: [name]}, 
+        #   'slots': {header or meta name, '' for other fields: [regex]}}
+        self.prefilter = prefilter
+        # Names of the technologies reported, None for all, see restrict()
+        self.allowed = allowed
+        self._regexes: Dict[str, 're.Pattern'] = {}
+        self._scanners: Dict[str, LiteralScanner] = {}
+        self._sets: Dict[Tuple[str, str], PatternSet] = {}
+        # Transitive closure of 'implies', one bit per technology: name -> bits of the technologies it implies, recursively. 
+        self._names: List[str] = sorted(set(technologies) | { name for tech in technologies.values() for name in tech['implies'] })
+        self._implies: Dict[str, int] = self._implies_closure()
+        # Set before the first analysis
+        self.engine = RegexEngine()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, obj:dict) -> 'FingerprintIndex':
+        """
+        Build the index of a technologies database. 
+        """
+        categories = { str(id): cat.get('name', '') for id, cat in obj['categories'].items() }
+        technologies = {}
+        for name, tech in obj['technologies'].items():
+            meta = tech.get('meta', {})
+            if not isinstance(meta, dict):
+                meta = {'generator': meta}
+            technologies[name] = {
+                'url': [ cls._pattern(p) for p in cls._list(tech.get('url')) ], 
+                'headers': { k.lower(): cls._pattern(v) for k, v in tech.get('headers', {}).items() }, 
+                'scripts': [ cls._pattern(p) for p in cls._list(tech.get('scripts')) ], 
+                'meta': { k.lower(): cls._pattern(v) for k, v in meta.items() }, 
+                'html': [ cls._pattern(p) for p in cls._list(tech.get('html')) ], 
+                'implies': [ i for i in map(cls._implied, cls._list(tech.get('implies'))) if i ], 
+                'excludes': cls._list(tech.get('excludes')), 
+                'cats': [ categories.get(str(c), '') for c in tech.get('cats', []) ], 
+            }
+        return cls(technologies, categories, cls._build_prefilter(technologies))
+
+    def restrict(self, only:TechnologyFilter) -> 'FingerprintIndex':
+        """
+        Return the index of the technologies allowed by the filter, and of the ones that imply them: 
+        they are matched to find the implied technologies, but not reported. 
+        """
+        names = set(self.technologies) | { name for tech in self.technologies.values() for name in tech['implies'] }
+        allowed = { name for name in names if only.allows(name, self.technologies[name]['cats'] if name in self.technologies else []) }
+        for name in only.techs - { name.casefold() for name in allowed }:
+            print(f"Unknown technology: {name}")
+        for name in only.categories - { name.casefold() for name in self.categories.values() }:
+            print(f"Unknown category: {name}")
+        technologies = { name: tech for name, tech in self.technologies.items() if ({name} | self.implied({name})) & allowed }
+        index = FingerprintIndex(technologies, self.categories, self._build_prefilter(technologies), allowed=allowed)
+        index.engine = self.engine
+        return index
+
+    @classmethod
+    def _build_prefilter(cls, technologies:Dict[str, dict]) -> Dict[str, dict]:
+        prefilter = {}
+        for field in cls.FIELDS:
+            literals: Dict[str, List[str]] = {}
+            unfiltered: List[str] = []
+            techs: Dict[str, List[str]] = {}
+            slots: Dict[str, List[str]] = {}
+            for name, tech in technologies.items():
+                patterns = tech[field].items() if isinstance(tech[field], dict) else [ ('', p) for p in tech[field] ]
+                for slot, (regex, _) in patterns:
+                    if regex not in slots.setdefault(slot, []):
+                        slots[slot].append(regex)
+                    if regex in techs:
+                        techs[regex].append(name)
+                        continue
+                    techs[regex] = [name]
+                    required = required_literals(regex)
+                    if not required:
+                        unfiltered.append(regex)
+                    for literal in required or ():
+                        literals.setdefault(literal, []).append(regex)
+            prefilter[field] = {'literals': literals, 'unfiltered': unfiltered, 'techs': techs, 'slots': slots}
+        return prefilter
+
+    @staticmethod
+    def _list(value) -> list:
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    @staticmethod
+    def _pattern(pattern:str) -> Tuple[str, Optional[str]]:
+        """
+        Split the regex from the version template: 'regex\\;version:\\1' -> ('regex', '\\1'). 
+        """
+        regex, *attrs = pattern.split('\\;')
+        version = None
+        for attr in attrs:
+            key, sep, value = attr.partition(':')
+            if sep and key == 'version':
+                version = value
+        return regex, version
+
+    @staticmethod
+    def _implied(implie:str) -> Optional[str]:
+        """
+        Return the name of an implied technology, None if its confidence is lower than 50. 
+        """
+        if 'confidence' not in implie:
+            return implie
+        match = re.search(r"(.+)\\;confidence:(\d+)", implie)
+        if match and int(match.group(2)) >= 50:
+            return match.group(1)
+        return None
+
+    @classmethod
+    def load(cls, path:str) -> 'FingerprintIndex':
+        with open(path, 'rb') as f:
+            return cls(*pickle.load(f))
+
+    def save(self, path:str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((self.technologies, self.categories, self.prefilter), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def regex(self, pattern:str) -> 're.Pattern':
+        """
+        Return the compiled regex of a pattern. 
+        """
+        try:
+            return self._regexes[pattern]
+        except KeyError:
+            pass
+        try:
+            regex = re.compile(pattern, re.I)
+        except re.error as err:
+            warnings.warn(f"Caught '{err}' compiling regex: {pattern}")
+            regex = self.NEVER
+        self._regexes[pattern] = regex
+        return regex
+
+    def scanner(self, field:str) -> LiteralScanner:
+        """
+        Return the scanner of the required literals of a field. 
+        """
+        scanner = self._scanners.get(field)
+        if not scanner:
+            with self._lock:
+                scanner = self._scanners.get(field)
+                if not scanner:
+                    scanner = self._scanners[field] = LiteralScanner(list(self.prefilter[field]['literals']))
+        return scanner
+
+    def body_scanner(self) -> LiteralScanner:
+        """
+        Return the scanner of the required literals of the fields taken from the body. 
+        """
+        scanner = self._scanners.get('body')
+        if not scanner:
+            with self._lock:
+                scanner = self._scanners.get('body')
+                if not scanner:
+                    scanner = self._scanners['body'] = LiteralScanner([ literal for field in self.BODY_FIELDS 
+                        for literal in self.prefilter[field]['literals'] ])
+        return scanner
+
+    def pattern_set(self, field:str, slot:str) -> PatternSet:
+        """
+        Return the patterns matched against the values of a field, or of a header or meta. 
+        """
+        patterns = self._sets.get((field, slot))
+        if not patterns:
+            patterns = self._sets[(field, slot)] = PatternSet(self.prefilter[field]['slots'].get(slot, []), regex=self.regex, engine=self.engine)
+        return patterns
+
+    @staticmethod
+    def _texts(page) -> Dict[str, str]:
+        """
+        Return the text of each field of the page. Values are joined with a character that no literal contains. 
+        """
+        return {
+            'url': page.url, 
+            'headers': '\0'.join(page.headers.values()), 
+            'scripts': '\0'.join(page.scripts), 
+            'meta': '\0'.join(page.meta.values()), 
+            'html': page.html, 
+        }
+
+    def candidates(self, page) -> Tuple[Dict[str, set], Dict[Tuple[str, str, str], set]]:
+        """
+        Return the patterns of each field that may match the page: the ones that have no required literal 
+        and the ones whose literals occur in the field. 
+        
+        When the regex engine can search the url or html, it finds the matching patterns faster than the literals: 
+        they are also returned, {(field, '', text): patterns}. 
+        """
+        candidates = {}
+        matches = {}
+        for field, text in self._texts(page).items():
+            patterns = self.pattern_set(field, '') if field in ('url', 'html') else None
+            if patterns and text.isascii() and patterns.engine_set().patterns:
+                # Prefilter the few patterns left to re
+                rest = set()
+                folded = fold(text)
+                for regex in patterns.patterns - patterns.engine_patterns:
+                    literals = required_literals(regex)
+                    if not literals or any(literal in folded for literal in literals):
+                        rest.add(regex)
+                candidates[field] = matches[(field, '', text)] = patterns.search(text, patterns.engine_patterns | rest)
+                continue
+            prefilter = self.prefilter[field]
+            patterns = set(prefilter['unfiltered'])
+            for literal in self.scanner(field).find(fold(text)):
+                patterns.update(prefilter['literals'][literal])
+            candidates[field] = patterns
+        return candidates, matches
+
+    @staticmethod
+    def _versions(regex:'re.Pattern', template:str, value:str) -> List[str]:
+        """
+        Return the versions of all the matches of the regex in value, formatted with the version template. 
+        """
+        versions = []
+        for matches in regex.findall(value):
+            version = template
+            # Check for a string to avoid enumerating the string
+            if isinstance(matches, str):
+                matches = [matches]
+            for index, match in enumerate(matches):
+                # Parse ternary operator
+                ternary = re.search(re.compile('\\\\' + str(index + 1) + '\\?([^:]+):(.*)$', re.I), version)
+                if ternary:
+                    version = version.replace(ternary.group(0), ternary.group(1) if match != '' else ternary.group(2))
+                # Replace back references
+                version = version.replace('\\' + str(index + 1), match)
+            if version != '':
+                versions.append(version)
+        return versions
+
+    def _values(self, page) -> Iterator[Tuple[str, str, str]]:
+        """
+        Return the (field, slot, value) of the page matched by `_match()`. 
+        """
+        yield 'url', '', page.url
+        for field, values in (('headers', page.headers), ('meta', page.meta)):
+            for slot in self.prefilter[field]['slots']:
+                if slot in values:
+                    yield field, slot, values[slot]
+        for script in page.scripts:
+            yield 'scripts', '', script
+        yield 'html', '', page.html
+
+    def _match(self, tech:dict, page, matching) -> Optional[Tuple[bool, List[str]]]:
+        """
+        Return whether the technology is detected on the page and the versions found, 
+        None if none of its patterns match. `matching(field, slot, value)` returns the patterns that match a value. 
+        """
+        matched = False
+        detected = False
+        versions: List[str] = []
+        def found(pattern:tuple, value:str, field:str, slot:str='') -> None:
+            nonlocal matched, detected
+            if pattern[0] not in matching(field, slot, value):
+                return
+            regex = self.regex(pattern[0])
+            matched = True
+            # url patterns only add versions
+            detected = detected or field != 'url'
+            if pattern[1] is not None:
+                for version in self._versions(regex, pattern[1], value):
+                    if version not in versions:
+                        versions.append(version)
+        
+        for pattern in tech['url']:
+            found(pattern, page.url, 'url')
+        for name, pattern in tech['headers'].items():
+            if name in page.headers:
+                found(pattern, page.headers[name], 'headers', name)
+        for pattern in tech['scripts']:
+            for script in page.scripts:
+                found(pattern, script, 'scripts')
+        for name, pattern in tech['meta'].items():
+            if name in page.meta:
+                found(pattern, page.meta[name], 'meta', name)
+        for pattern in tech['html']:
+            found(pattern, page.html, 'html')
+        return (detected, versions) if matched else None
+
+    def _implies_closure(self) -> Dict[str, int]:
+        bits = { name: 1 << i for i, name in enumerate(self._names) }
+        closure = {}
+        for start, tech in self.technologies.items():
+            if not tech['implies']:
+                continue
+            implied = 0
+            todo = [start]
+            while todo:
+                tech = self.technologies.get(todo.pop())
+                for name in tech['implies'] if tech else ():
+                    if not implied & bits[name]:
+                        implied |= bits[name]
+                        todo.append(name)
+            closure[start] = implied
+        return closure
+
+    def implied(self, detected:set) -> set:
+        """
+        Return the technologies implied by the detected technologies, recursively. 
+        """
+        bits = 0
+        for name in detected:
+            bits |= self._implies.get(name, 0)
+        implied = set()
+        while bits:
+            low = bits & -bits
+            implied.add(self._names[low.bit_length() - 1])
+            bits ^= low
+        return implied
+
+    def analyze(self, page, shared:Optional[dict]=None) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Return the technologies detected on a python-Wappalyzer `WebPage`: {name: {'versions': [...], 'categories': [...]}}. 
+        `shared` holds the matching patterns of the values of the `SHARED_FIELDS` across pages, see `analyze_many()`. 
+        """
+        candidates, matches = self.candidates(page)
+        # (field, slot, value) -> matching patterns. 
+        # The patterns matching a value don't depend on the page: a pattern whose literals occur in the value is a candidate 
+        # of every page with this value, so the matches of the shared fields can be reused on other pages. 
+        def matching(field:str, slot:str, value:str) -> set:
+            key = (field, slot, value)
+            cache = shared if shared is not None and field in self.SHARED_FIELDS else matches
+            if key not in cache:
+                cache[key] = self.pattern_set(field, slot).search(value, candidates[field], combine=field in self.COMBINED_FIELDS)
+            return cache[key]
+        # Only the technologies with a matching pattern can be detected
+        names = { name for field, slot, value in self._values(page) 
+            for regex in matching(field, slot, value) for name in self.prefilter[field]['techs'][regex] }
+        detected = set()
+        versions: Dict[str, List[str]] = {}
+        for name in names:
+            tech = self.technologies[name]
+            match = self._match(tech, page, matching)
+            if match:
+                if match[0]:
+                    detected.add(name)
+                versions[name] = sorted(match[1], key=len)
+        results = {}
+        for name in detected | self.implied(detected):
+            if self.allowed is not None and name not in self.allowed:
+                continue
+            tech = self.technologies.get(name)
+            results[name] = {'versions': versions.get(name, []), 'categories': tech['cats'] if tech else []}
+        return results
+
+    def analyze_many(self, pages:list) -> List[Dict[str, Dict[str, List[str]]]]:
+        """
+        Return the technologies detected on each page, like `analyze()`. 
+        Each distinct header, script and meta value of the batch is matched once. 
+        """
+        shared: dict = {}
+        return [ self.analyze(page, shared) for page in pages ]
+
+class StreamMatcher:
+    """
+    Follow the fingerprint literals found in a body while it downloads, to stop reading once none has appeared for `idle` bytes. 
+    
+    A fingerprint can't match where none of its required literals occur, so a long stretch of the body without any new one 
+    is unlikely to change the result. It's a heuristic: there is no exact point where the remaining body can't match, 
+    any fingerprint (or another version) may still occur further down. 
+    """
+    def __init__(self, scanner:LiteralScanner, idle:int) -> None:
+        self.scanner = scanner
+        self.idle = idle
+        self.seen: set = set()
+        self.received = 0
+        # Offset of the body where the last new literal was found
+        self.last_found = 0
+        # End of the previous chunk, to find the literals across two chunks
+        self._overlap = max(map(len, scanner.literals), default=1) - 1
+        self._tail = ''
+
+    def feed(self, chunk:bytes) -> bool:
+        """
+        Scan the next chunk of the body, return False when the download can stop. 
+        """
+        # Literals are folded ASCII, decoding as latin-1 keeps the ASCII bytes as they are
+        text = self._tail + chunk.decode('latin-1').lower()
+        self._tail = text[-self._overlap:] if self._overlap else ''
+        self.received += len(chunk)
+        found = self.scanner.find(text) - self.seen
+        if found:
+            self.seen |= found
+            self.last_found = self.received
+        return self.received - self.last_found < self.idle
+
+class FastWebPage:
+    """
+    Same fields as python-Wappalyzer's `WebPage`: url, html, headers, scripts (src of the script tags) and 
+    meta (content of the meta tags by lowercase name), without building a BeautifulSoup tree. 
+    
+    The html is fed to lxml's HTML parser like BeautifulSoup's lxml builder does, but the parser calls `start()` 
+    for each tag instead of building a tree, so scripts and meta are the same as `WebPage`'s. 
+    The tree is only built if `parsed_html` is used. 
+    """
+    def __init__(self, url:str, html:str, headers:dict) -> None:
+        self.url = url
+        self.html = html
+        self.headers = headers
+        try:
+            list(self.headers.keys())
+        except AttributeError:
+            raise ValueError("Headers must be a dictionary-like object")
+        self.scripts: List[str] = []
+        self.meta: Dict[str, str] = {}
+        self._parsed_html = None
+        self._parse_html()
+
+    def _parse_html(self) -> None:
+        html = self.html
+        if html[:1] == '\ufeff':
+            html = html[1:]
+        # Like BeautifulSoup: parse the text, then its UTF-8 encoding if lxml rejects it
+        error: Optional[Exception] = None
+        for markup, encoding in ((html, None), (html.encode('utf-8'), 'utf8')):
+            self.scripts, self.meta = [], {}
+            parser = lxml.etree.HTMLParser(target=self, recover=True, encoding=encoding)
+            try:
+                parser.feed(markup)
+                parser.close()
+                return
+            except (UnicodeDecodeError, LookupError, lxml.etree.ParserError) as e:
+                error = e
+        raise ValueError(f"Could not parse the page: {error}")
+
+    def start(self, tag:str, attrib:dict) -> None:
+        if tag == 'script':
+            if 'src' in attrib:
+                self.scripts.append(attrib['src'])
+        elif tag == 'meta':
+            if 'name' in attrib and 'content' in attrib:
+                self.meta[attrib['name'].lower()] = attrib['content']
+
+    def close(self) -> None:
+        pass
+
+    @property
+    def parsed_html(self):
+        if self._parsed_html is None:
+            from bs4 import BeautifulSoup
+            self._parsed_html = BeautifulSoup(self.html, 'lxml')
+        return self._parsed_html
+
+def _timed_adapter(observe, **kwargs):
+    """
+    Return a `requests.adapters.HTTPAdapter` calling `observe(seconds)` with the time taken by each new connection, TLS handshake included. 
+    """
+    import requests.adapters
+    import urllib3.poolmanager
+    pools = {}
+    for scheme, pool in urllib3.poolmanager.pool_classes_by_scheme.items():
+        class TimedConnection(pool.ConnectionCls):
+            def connect(self):
+                began = time.monotonic()
+                super().connect()
+                observe(time.monotonic() - began)
+        pools[scheme] = type(pool.__name__, (pool,), {'ConnectionCls': TimedConnection})
+    class TimedAdapter(requests.adapters.HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = pools
+    return TimedAdapter(**kwargs)
+
+class PythonWappalyzer(IWappalyzer):
+    
+    def __init__(self, timeouts:Optional[TimeoutPolicy]=None, fingerprints:Optional[FingerprintDB]=None, regex_engine:str='re', 
+                 timeout:float=1000, pool_hosts:int=100, pool_size:int=10, processes:int=0, max_body:int=10485760, max_read_time:float=30, 
+                 stream_idle:int=0, only:Optional[TechnologyFilter]=None, analyze_batch:int=1, workers:int=1) -> None:
+        try:
+            import Wappalyzer
+            import requests
+            import requests.adapters
+        except ImportError:
+            print("Please install python-Wappalyzer.")
+            exit(1)
+
+        self.Wappalyzer = Wappalyzer
+        self.requests = requests
+        # One connection pool shared by all threads: keep-alive connections of up to `pool_hosts` hosts, 
+        # `pool_size` per host. urllib3 pools are thread-safe, sessions (cookies) are not: one session per thread. 
+        self._adapter = _timed_adapter(lambda seconds: self.timeouts.observe('connect', seconds), 
+            pool_connections=pool_hosts, pool_maxsize=pool_size)
+        self._local = threading.local()
+        self.pool_size = pool_size
+        # aiohttp connection pool of the running event loop and connection timing, see analyze_async()
+        self._connector = None
+        self._trace = None
+        # Bodies are truncated after `max_body` bytes or `max_read_time` seconds, 0 to disable
+        self.max_body = max_body
+        self.max_read_time = max_read_time
+        # Bodies are also truncated when no fingerprint literal appeared in the last `stream_idle` bytes, 0 to disable
+        self.stream_idle = stream_idle
+        self._truncated: Dict[str, str] = {}
+        self.index, self.fingerprints = (fingerprints or FingerprintDB()).index()
+        self.index.engine = REGEX_ENGINES[regex_engine]()
+        if only:
+            self.index = self.index.restrict(only)
+            print(f"Matching the fingerprints of {len(self.index.technologies)} technologies, reporting {len(self.index.allowed)}")
+        # Pages are parsed and matched in these processes if any, the GIL limits the threads to one core. 
+        # Started right away so they are forked before the worker threads, and inherit the index data. 
+        self._processes: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        if processes > 0:
+            self._processes = concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_analysis_process, 
+                initargs=(self.index.technologies, self.index.categories, self.index.prefilter, self.index.allowed, regex_engine))
+            self._processes.submit(int).result()
+        # The pages downloaded at the same time by the `workers` threads calling analyze() are analyzed together: 
+        # by up to one batch per analysis process, or per thread when the regex engine matches without holding the GIL. 
+        # With re, the threads can't match in parallel anyway, one batch at a time. 
+        self._batcher: Optional[MicroBatcher] = None
+        if analyze_batch > 1:
+            concurrency = processes or (workers if regex_engine != 're' else 1)
+            self._batcher = MicroBatcher(lambda pages: self.analyze_pages(*zip(*pages)), maximum=analyze_batch, concurrency=concurrency)
+        # 'connect' includes the TLS handshake, 'total' is checked while the body is read. 
+        # The connect and first byte timeouts start at 10 seconds, up to `timeout` when learned or retrying. 
+        self.timeouts = timeouts or TimeoutPolicy(ceilings={'connect': timeout, 'first_byte': timeout, 'total': timeout}, 
+            floors={'connect': 3, 'first_byte': 5, 'total': 5}, initial={'connect': 10, 'first_byte': 10})
+    
+    def session(self):
+        """
+        Return the `requests.Session` of the current thread, mounted on the shared connection pool. 
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+        return session
+
+    def download(self, host:str) -> Tuple[str, bytes, dict]:
+        """
+        Download the page of the host, return the final URL, the body and the headers. 
+        """
+        session = self.session()
+        # Cookies set by a host must not be sent to the next ones
+        session.cookies.clear()
+        began = time.monotonic()
+        try:
+            response = session.get(ensure_scheme(host), stream=True, 
+                timeout=(self.timeouts.get('connect'), self.timeouts.get('first_byte')))
+        except self.requests.Timeout as e:
+            raise AnalysisTimeout(f"fetching {host} timed out: {e}") from e
+        # Connection errors and invalid URLs, ValueError includes UnicodeError
+        except (self.requests.RequestException, ValueError) as e:
+            raise AnalysisError(f"fetching {host} failed: {e}") from e
+        with response:
+            self.timeouts.observe('first_byte', response.elapsed.total_seconds())
+            content = self._read(host, response, began, self.timeouts.get('total'))
+        self.timeouts.observe('total', time.monotonic() - began)
+        return response.url, content, response.headers
+
+    def _read(self, host:str, response, began:float, total:float) -> bytes:
+        """
+        Read the body of a streamed response, up to the size and read time limits. 
+        A body that stops coming (read timeout) is also truncated, the headers are analyzed. 
+        Raise `AnalysisTimeout` if the download takes more than `total` seconds, before the read time limit. 
+        """
+        import urllib3.exceptions
+        read = self._read1(response.raw)
+        matcher = self._matcher()
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            elapsed = time.monotonic() - began
+            if self.max_read_time and elapsed > self.max_read_time:
+                self._truncate(host, 'time limit')
+                break
+            if elapsed > total:
+                raise AnalysisTimeout(f"fetching {host} timed out after {total:.0f} seconds")
+            try:
+                chunk = read(65536)
+            except urllib3.exceptions.ReadTimeoutError:
+                self._truncate(host, 'time limit')
+                break
+            except urllib3.exceptions.HTTPError as e:
+                raise AnalysisError(f"reading {host} failed: {e}") from e
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            # A body of exactly max_body bytes is complete
+            if self.max_body and size > self.max_body:
+                self._truncate(host, 'size limit')
+                break
+            if matcher and not matcher.feed(chunk):
+                self._truncate(host, 'early stop')
+                break
+        content = b''.join(chunks)
+        return content[:self.max_body] if self.max_body else content
+
+    @staticmethod
+    def _read1(raw):
+        """
+        Return a function reading up to `amt` bytes of the decoded body of a urllib3 response, returning what is 
+        received so far: a server sending a byte at a time does not hold the read, the time limits are checked in between. 
+        """
+        if hasattr(raw, 'read1'):
+            return lambda amt: raw.read1(amt, decode_content=True)
+        # urllib3 1.x read(amt) waits for amt bytes: read the http.client response and decode like urllib3 does
+        raw._init_decoder()
+        def read1(amt:int) -> bytes:
+            while True:
+                # Raises urllib3 exceptions, ex: ReadTimeoutError
+                with raw._error_catcher():
+                    data = raw._fp.read1(amt) if raw._fp else b''
+                    if not data and raw._fp:
+                        # Like urllib3 read(), the connection goes back to the pool once the response is closed
+                        raw._fp.close()
+                    decoded = raw._decode(data, decode_content=True, flush_decoder=not data)
+                # Compressed data may not decode to anything yet
+                if decoded or not data:
+                    return decoded
+        return read1
+
+    def _matcher(self) -> Optional[StreamMatcher]:
+        return StreamMatcher(self.index.body_scanner(), self.stream_idle) if self.stream_idle else None
+
+    def _truncate(self, host:str, limit:str) -> None:
+        self._truncated[host] = limit
+
+    @property
+    def truncated(self) -> Dict[str, str]:
+        return self._truncated
+
+    async def fetch_async(self, host:str) -> Tuple[str, bytes, dict]:
+        """
+        Download the page of the host with aiohttp, return the final URL, the body and the headers. 
+        Connections are pooled per event loop, cookies are kept for the redirects only, like `download()`. 
+        """
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.pool_size)
+        if self._trace is None:
+            self._trace = self._connect_trace()
+        timeout = aiohttp.ClientTimeout(sock_connect=self.timeouts.get('connect'), sock_read=self.timeouts.get('first_byte'))
+        began = time.monotonic()
+        try:
+            async with aiohttp.ClientSession(connector=self._connector, connector_owner=False, timeout=timeout, 
+                    cookie_jar=aiohttp.CookieJar(unsafe=True), headers={'User-Agent': self.requests.utils.default_user_agent()}, 
+                    trace_configs=[ self._trace ]) as session:
+                async with session.get(ensure_scheme(host)) as response:
+                    self.timeouts.observe('first_byte', time.monotonic() - began)
+                    content = await self._read_async(host, response, began, self.timeouts.get('total'))
+        except asyncio.TimeoutError as e:
+            raise AnalysisTimeout(f"fetching {host} timed out: {e}") from e
+        # Connection errors and invalid URLs, ValueError includes UnicodeError
+        except (aiohttp.ClientError, ValueError) as e:
+            raise AnalysisError(f"fetching {host} failed: {e}") from e
+        self.timeouts.observe('total', time.monotonic() - began)
+        # Same headers as requests: repeated headers are joined with a comma
+        headers = self.requests.structures.CaseInsensitiveDict()
+        for name, value in response.headers.items():
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        return str(response.url), content, headers
+
+    def _connect_trace(self) -> 'aiohttp.TraceConfig':
+        """
+        Return the aiohttp trace observing the time taken by each new connection. 
+        """
+        async def start(session, context, params):
+            context.began = time.monotonic()
+        async def end(session, context, params):
+            self.timeouts.observe('connect', time.monotonic() - context.began)
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_start.append(start)
+        trace.on_connection_create_end.append(end)
+        trace.freeze()
+        return trace
+
+    async def _read_async(self, host:str, response, began:float, total:float) -> bytes:
+        """
+        Read the body of an aiohttp response, up to the size and read time limits, like `_read()`. 
+        """
+        matcher = self._matcher()
+        chunks: List[bytes] = []
+        size = 0
+        read_time = min(self.max_read_time or total, total)
+        while True:
+            try:
+                chunk = await asyncio.wait_for(response.content.readany(), began + read_time - time.monotonic())
+            except asyncio.TimeoutError:
+                elapsed = time.monotonic() - began
+                if elapsed >= total and not (self.max_read_time and elapsed >= self.max_read_time):
+                    raise AnalysisTimeout(f"fetching {host} timed out after {total:.0f} seconds")
+                self._truncate(host, 'time limit')
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            if self.max_body and size > self.max_body:
+                self._truncate(host, 'size limit')
+                break
+            if matcher and not matcher.feed(chunk):
+                self._truncate(host, 'early stop')
+                break
+        content = b''.join(chunks)
+        return content[:self.max_body] if self.max_body else content
+
+    @staticmethod
+    def page(url:str, content:bytes, headers:dict):
+        """
+        Return the `WebPage` of a downloaded page, the body is decoded like `requests.Response.text`. 
+        A `FastWebPage` is returned if lxml is installed. 
+        """
+        import requests
+        import Wappalyzer
+        encoding = requests.utils.get_encoding_from_headers(headers)
+        if encoding is None:
+            encoding = requests.compat.chardet.detect(content)['encoding'] if requests.compat.chardet else 'utf-8'
+        try:
+            html = str(content, encoding or 'utf-8', errors='replace')
+        except (LookupError, TypeError):
+            html = str(content, errors='replace')
+        if lxml is not None:
+            return FastWebPage(url, html=html, headers=headers)
+        return Wappalyzer.WebPage(url, html=html, headers=headers)
+
+    @classmethod
+    def detect(cls, index:'FingerprintIndex', url:str, content:bytes, headers:dict) -> List[Tuple[str, Optional[str]]]:
+        """
+        Return the names and versions of the technologies of a downloaded page. 
+        """
+        return cls.detect_many(index, [ (url, content, headers) ])[0]
+
+    @classmethod
+    def detect_many(cls, index:'FingerprintIndex', pages:List[Tuple[str, bytes, dict]]) -> List[List[Tuple[str, Optional[str]]]]:
+        """
+        Return the names and versions of the technologies of each downloaded page. 
+        """
+        return [ [ (name, info['versions'][0] if info['versions'] else None) for name, info in results.items() ] 
+            for results in index.analyze_many([ cls.page(*page) for page in pages ]) ]
+
+    def analyze_page(self, host:str, page:Tuple[str, bytes, dict]) -> List[Technology]:
+        """
+        Return the technologies of a page returned by `download()` or `fetch_async()`. 
+        """
+        if self._processes:
+            return self._technologies(host, self._processes.submit(_analyze_in_process, *page).result())
+        return self._technologies(host, self.detect(self.index, *page))
+
+    def analyze_pages(self, hosts:List[str], pages:List[Tuple[str, bytes, dict]]) -> List[List[Technology]]:
+        """
+        Return the technologies of each page returned by `download()` or `fetch_async()`, in a single batch: 
+        the values repeated across the pages (headers, scripts, meta) are matched once. 
+        """
+        if self._processes:
+            found = self._processes.submit(_analyze_many_in_process, pages).result()
+        else:
+            found = self.detect_many(self.index, pages)
+        return [ self._technologies(host, f) for host, f in zip(hosts, found) ]
+
+    def analyze(self, host:str) -> List[Technology]:
+        if self._batcher:
+            return self._batcher((host, self.download(host)))
+        return self.analyze_page(host, self.download(host))
+
+    async def analyze_async(self, host:str) -> List[Technology]:
+        """
+        Fetch the page on the event loop with aiohttp, parse and match it in the analysis processes or 
+        the default executor so the loop is not blocked. 
+        Runs `analyze()` in the default executor if aiohttp is not installed. 
+        """
+        if aiohttp is None:
+            return await super().analyze_async(host)
+        page = await self.fetch_async(host)
+        loop = asyncio.get_running_loop()
+        if self._processes:
+            found = await loop.run_in_executor(self._processes, _analyze_in_process, *page)
+        else:
+            found = await loop.run_in_executor(None, self.detect, self.index, *page)
+        return self._technologies(host, found)
+
+    def _technologies(self, host:str, found:List[Tuple[str, Optional[str]]]) -> List[Technology]:
+        techs = []
+        for name, version in found:
+            tech = self.index.technologies.get(name)
+            techs.append(Technology(host, name=name, version=version, categories=tech['cats'] if tech else []))
+        return techs
+
+    def close(self) -> None:
+        self._adapter.close()
+        if self._processes:
+            shutdown_executor(self._processes)
+
+    async def aclose(self) -> None:
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+
+
+# Index of the analysis processes of PythonWappalyzer
+_process_index: Optional[FingerprintIndex] = None
+
+def _init_analysis_process(technologies:Dict[str, dict], categories:Dict[str, str], prefilter:Dict[str, dict], 
+                           allowed:Optional[set], regex_engine:str) -> None:
+    global _process_index
+    # Interruptions are handled by the parent process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _process_index = FingerprintIndex(technologies, categories, prefilter, allowed=allowed)
+    _process_index.engine = REGEX_ENGINES[regex_engine]()
+
+def _analyze_in_process(url:str, content:bytes, headers:dict) -> List[Tuple[str, Optional[str]]]:
+    return PythonWappalyzer.detect(_process_index, url, content, headers)
+
+def _analyze_many_in_process(pages:List[Tuple[str, bytes, dict]]) -> List[List[Tuple[str, Optional[str]]]]:
+    return PythonWappalyzer.detect_many(_process_index, pages)
+            
+class Attempt:
+    """
+    An analysis attempt that can be cancelled, ex: the slower of two hedged attempts. 
+    
+    Code running an attempt registers callbacks that stop its work (kill a process, a worker) with `add()`, 
+    and removes them with `discard()` when the work is done. The attempt running in the current thread 
+    or asyncio task is returned by `Attempt.current()`. 
+    """
+    _current: 'contextvars.ContextVar[Optional[Attempt]]' = contextvars.ContextVar('masswappalyzer_attempt', default=None)
+
+    def __init__(self, avoid=None) -> None:
+        # The backend to avoid and the backend used, when analyzing with a BackendPool
+        self.avoid = avoid
+        self.backend = None
+        self.cancelled = False
+        self._callbacks: Dict[object, object] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def current(cls) -> Optional['Attempt']:
+        return cls._current.get()
+
+    def run(self, func, *args):
+        """
+        Call func in the context of this attempt, then forget the callbacks. 
+        """
+        token = self._current.set(self)
+        try:
+            return func(*args)
+        finally:
+            self._current.reset(token)
+            self.close()
+
+    async def run_async(self, coro_func, *args):
+        """
+        Coroutine version of `run()`. 
+        """
+        token = self._current.set(self)
+        try:
+            return await coro_func(*args)
+        finally:
+            self._current.reset(token)
+            self.close()
+
+    def add(self, key, callback) -> None:
+        with self._lock:
+            cancelled = self.cancelled
+            if not cancelled:
+                self._callbacks[key] = callback
+        if cancelled:
+            callback()
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._callbacks.pop(key, None)
+
+    def close(self) -> None:
+        with self._lock:
+            self._callbacks.clear()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        for callback in callbacks:
+            callback()
+
+class ProcessReaper:
+    """
+    Track the process groups and docker containers started during a scan, 
+    so the whole process tree (ex: headless browsers) and the container are killed on timeout, error or Ctrl-C. 
+    
+    Each process is started in a new process group, `docker run` commands are given a name and the label 
+    `masswappalyzer.scan=<token>` so `sweep()` can find and remove any leftover at the end of the scan. 
+    """
+    def __init__(self, memory_limit:Optional[int]=None, env:Optional[Dict[str, str]]=None) -> None:
+        # Memory limit of each process in MB: RLIMIT_DATA for local processes, --memory for docker containers
+        self.memory_limit = memory_limit
+        # Environment of the processes, ex: DOCKER_HOST
+        self.env = env
+        self.token = uuid.uuid4().hex[:8]
+        self.label = f"masswappalyzer.scan={self.token}"
+        self.closed = False
+        self._names = itertools.count()
+        self._docker = False
+        self._lock = threading.Lock()
+        # pid -> container name or None
+        self._processes: Dict[int, Optional[str]] = {}
+        # pid -> the attempt that started the process
+        self._attempts: Dict[int, Attempt] = {}
+        atexit.register(self.sweep)
+
+    def docker_run_args(self) -> List[str]:
+        """
+        Return the `docker run` arguments that name and label a new container. 
+        """
+        self._docker = True
+        run_args = [ '--name', f"masswappalyzer-{self.token}-{next(self._names)}", '--label', self.label ]
+        if self.memory_limit:
+            run_args += [ '--memory', f'{self.memory_limit}m' ]
+        return run_args
+
+    def command(self, cmd:List[str]) -> Tuple[List[str], Optional[str]]:
+        """
+        Return the command to run and the name of its container, `docker run` commands are given a name and a label. 
+        """
+        if cmd[:2] == [ 'docker', 'run' ]:
+            run_args = self.docker_run_args()
+            return cmd[:2] + run_args + cmd[2:], run_args[1]
+        return cmd, None
+
+    def track(self, pid:int, container:Optional[str]=None, docker:bool=False) -> None:
+        """
+        Track a process started in a new process group and apply the memory limit, inherited by its children. 
+        """
+        attempt = Attempt.current()
+        with self._lock:
+            self._processes[pid] = container
+            if attempt:
+                self._attempts[pid] = attempt
+        if attempt:
+            attempt.add(pid, lambda: self.kill(pid))
+        if self.closed:
+            # Swept while the process started
+            self.kill(pid)
+            return
+        if self.memory_limit and not docker and resource:
+            # RLIMIT_AS would prevent browsers from reserving their address space, RLIMIT_DATA only counts writable memory
+            limit = self.memory_limit * 1024 * 1024
+            try:
+                resource.prlimit(pid, resource.RLIMIT_DATA, (limit, limit))
+            except (ProcessLookupError, PermissionError, AttributeError):
+                pass
+
+    def popen(self, cmd:List[str], **kwargs) -> subprocess.Popen:
+        """
+        Start a tracked process in a new process group. 
+        """
+        cmd, container = self.command(cmd)
+        if self.closed:
+            raise RuntimeError("The scan is over, not starting new processes")
+        proc = subprocess.Popen(cmd, start_new_session=True, env=self.env, **kwargs)
+        self.track(proc.pid, container, docker=cmd[0] == 'docker')
+        return proc
+
+    @staticmethod
+    def _kill_group(pid:int, exited:bool=False) -> bool:
+        """
+        Kill the process group, return True if some processes were still running.  
+        Without process groups (Windows), only the process is killed, unless it `exited`. 
+        """
+        if not hasattr(os, 'killpg'):
+            if exited:
+                return False
+            try:
+                # TerminateProcess(), like Popen.kill()
+                os.kill(pid, signal.SIGTERM)
+                return True
+            except OSError:
+                return False
+        try:
+            os.killpg(pid, signal.SIGKILL)
+            return True
+        except (ProcessLookupError, PermissionError):
+            return False
+
+    def release(self, pid:int) -> None:
+        """
+        Forget a process that exited, kill the processes left in its group. 
+        """
+        with self._lock:
+            self._processes.pop(pid, None)
+            attempt = self._attempts.pop(pid, None)
+        if attempt:
+            attempt.discard(pid)
+        self._kill_group(pid, exited=True)
+
+    def kill(self, pid:int) -> None:
+        """
+        Kill the process group and remove the container of a process. 
+        The caller must still wait for the process. 
+        """
+        with self._lock:
+            container = self._processes.pop(pid, None)
+            attempt = self._attempts.pop(pid, None)
+        if attempt:
+            attempt.discard(pid)
+        self._kill_group(pid)
+        if container:
+            subprocess.run(args=[ 'docker', 'rm', '-f', container ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=self.env)
+
+    def sweep(self) -> None:
+        """
+        Kill all tracked process groups and remove all containers of the scan, report leftovers. 
+        Processes can't be started after the sweep. 
+        """
+        with self._lock:
+            self.closed = True
+            pids, self._processes = list(self._processes), {}
+        leftover_processes = 0
+        for pid in pids:
+            if self._kill_group(pid):
+                leftover_processes += 1
+        leftover_containers = []
+        if self._docker:
+            o = subprocess.run(args=[ 'docker', 'ps', '-aq', '--filter', f'label={self.label}' ], 
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=self.env)
+            leftover_containers = o.stdout.decode().split()
+            if leftover_containers:
+                subprocess.run(args=[ 'docker', 'rm', '-f' ] + leftover_containers, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=self.env)
+            self._docker = False
+        if leftover_processes or leftover_containers:
+            print(f"Removed {leftover_processes} leftover process groups and {len(leftover_containers)} leftover containers")
+
+def docker_image_config(image:str, env:Optional[Dict[str, str]]=None) -> dict:
+    """
+    Return the config of a docker image (Entrypoint, Cmd, WorkingDir, etc), empty dict if the image can't be inspected. 
+    """
+    o = subprocess.run(args=[ 'docker', 'image', 'inspect', '--format', '{{json .Config}}', image ], 
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+    return json.loads(o.stdout) if o.returncode == 0 else {}
+
+def docker_image_command(config:dict) -> List[str]:
+    """
+    Return the command `docker run image <args>` runs before the arguments: the image entrypoint, 
+    or its cmd if it has none, as the arguments replace the cmd. 
+    """
+    return config.get('Entrypoint') or config.get('Cmd') or []
+
+class DockerContainerPool:
+    """
+    Long-lived containers of the Wappalyzer CLI image. 
+    Commands are run in the containers with `docker exec` instead of creating and destroying a container for each URL. 
+    """
+    def __init__(self, image:str, size:int, reaper:ProcessReaper) -> None:
+        self.image = image
+        self.env = reaper.env
+        config = docker_image_config(image, self.env)
+        # Command to run the CLI inside the container
+        self.command: List[str] = docker_image_command(config) or [ 'node', 'cli.js' ]
+        self.names: List[str] = []
+        self._idle: 'queue.Queue[str]' = queue.Queue()
+        atexit.register(self.close)
+        for _ in range(size):
+            run_args = reaper.docker_run_args()
+            subprocess.run(args=[ 'docker', 'run', '-d', '--rm' ] + run_args + [ '--entrypoint', 'tail', image, '-f', '/dev/null' ], 
+                stdout=subprocess.DEVNULL, check=True, env=self.env)
+            self.names.append(run_args[1])
+            self._idle.put(run_args[1])
+
+    @contextlib.contextmanager
+    def container(self):
+        """
+        Context manager that yields the name of an idle container. 
+        """
+        name = self._idle.get()
+        try:
+            yield name
+        finally:
+            self.release(name)
+
+    async def acquire_async(self) -> str:
+        """
+        Return the name of an idle container without blocking the event loop. 
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        future = asyncio.get_running_loop().run_in_executor(None, self._idle.get)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The executor thread still takes a container, give it back
+            future.add_done_callback(lambda f: f.cancelled() or self.release(f.result()))
+            raise
+
+    def release(self, name:str) -> None:
+        self._idle.put(name)
 
+    def reset(self, name:str) -> None:
+        """
+        Kill every process of the container except its main process, i.e. the CLI process tree left by a killed `docker exec`. 
+        """
+        subprocess.run(args=[ 'docker', 'exec', name, 'sh', '-c', 'kill -9 -1' ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=self.env)
 
-##### Core
+    def close(self) -> None:
+        """
+        Remove the containers. 
+        """
+        names, self.names = self.names, []
+        if names:
+            subprocess.run(args=[ 'docker', 'rm', '-f' ] + names, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=self.env)
 
-class Technology:
+class _CappedReader(threading.Thread):
     """
-    A detected technology.
+    Read a pipe until EOF in a thread, keep at most `cap` bytes and call `on_overflow` once if more is written. 
+    The pipe is closed at EOF, also when the process was killed. 
     """
-    def __init__(self, url:str, name:str, version:Optional[str]=None) -> None:
-        self.url = url
-        self.name = name
-        self.version: Optional[str] = version
+    def __init__(self, pipe, cap:int, on_overflow=None) -> None:
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.cap = cap
+        self.on_overflow = on_overflow
+        self.data = bytearray()
+        self.overflow = False
+        self.start()
 
-class IWappalyzer:
-    def analyze(self, host) -> List[Technology]:
-        ...
+    def run(self) -> None:
+        with self.pipe:
+            while True:
+                chunk = self.pipe.read1(65536)
+                if not chunk:
+                    break
+                if len(self.data) + len(chunk) > self.cap and not self.overflow:
+                    self.overflow = True
+                    if self.on_overflow:
+                        self.on_overflow()
+                if not self.overflow:
+                    self.data += chunk
 
-class PythonWappalyzer(IWappalyzer):
-    
-    def __init__(self) -> None:
+async def _read_capped_async(stream:asyncio.StreamReader, cap:int, on_overflow=None) -> Tuple[bytes, bool]:
+    """
+    Coroutine version of `_CappedReader`, return the data and whether it overflowed. 
+    """
+    data = bytearray()
+    overflow = False
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        if len(data) + len(chunk) > cap and not overflow:
+            overflow = True
+            if on_overflow:
+                on_overflow()
+        if not overflow:
+            data += chunk
+    return bytes(data), overflow
+
+# Node script that loads the Wappalyzer driver once, keeps one headless browser open 
+# and analyzes the URLs read on stdin, each in a fresh incognito browser context. 
+# The browser is relaunched after `recyclePages` pages or when the process tree uses more than `recycleRss` MB, to contain leaks. 
+# Protocol: one JSON object per line. 
+#   - Emits {"ready": true} when the driver is initialized. 
+#   - Reads {"id": <int>, "url": <str>}, replies {"id": <int>, "url": <str>, "technologies": [...]} 
+#     or {"id": <int>, "url": <str>, "error": <str>}. 
+# Exits when stdin is closed. 
+# Arguments: path of the Wappalyzer driver module, driver options as JSON, bridge options as JSON. 
+NODE_BRIDGE_JS = r"""
+console.log = console.error
+const fs = require('fs')
+const readline = require('readline')
+const Wappalyzer = require(process.argv[1])
+const options = JSON.parse(process.argv[2] || '{}')
+const { recyclePages = 0, recycleRss = 0 } = JSON.parse(process.argv[3] || '{}')
+const write = (message) => process.stdout.write(JSON.stringify(message) + '\n')
+
+// Resident memory of the process tree rooted at pid, in MB (Linux only)
+const treeRss = (root) => {
+  const children = {}
+  const rss = {}
+  for (const pid of fs.readdirSync('/proc').filter((name) => /^\d+$/.test(name))) {
+    try {
+      const stat = fs.readFileSync(`/proc/${pid}/stat`, 'utf8')
+      const fields = stat.slice(stat.lastIndexOf(')') + 2).split(' ')
+      ;(children[fields[1]] = children[fields[1]] || []).push(pid)
+      rss[pid] = parseInt(fields[21], 10) * 4096
+    } catch (error) {
+      // Process exited
+    }
+  }
+  let total = 0
+  const stack = [String(root)]
+  while (stack.length) {
+    const pid = stack.pop()
+    total += rss[pid] || 0
+    stack.push(...(children[pid] || []))
+  }
+  return total / 1024 / 1024
+}
+
+const launch = async () => {
+  const wappalyzer = new Wappalyzer(options)
+  await wappalyzer.init()
+  return wappalyzer
+}
+
+// Open the page in a new incognito context of the shared browser
+const analyze = async (wappalyzer, url) => {
+  const browser = wappalyzer.browser
+  const createContext = browser && (browser.createIncognitoBrowserContext || browser.createBrowserContext)
+  const context = createContext ? await createContext.call(browser) : null
+  if (context) {
+    wappalyzer.browser = new Proxy(browser, {
+      get: (target, property) => {
+        if (property === 'newPage') return () => context.newPage()
+        const value = Reflect.get(target, property)
+        return typeof value === 'function' ? value.bind(target) : value
+      }
+    })
+  }
+  try {
+    const site = await wappalyzer.open(url)
+    return await site.analyze()
+  } finally {
+    wappalyzer.browser = browser
+    if (context) await context.close().catch(() => {})
+  }
+}
+
+;(async () => {
+  let wappalyzer = await launch()
+  let pages = 0
+  write({ ready: true })
+  const lines = readline.createInterface({ input: process.stdin })
+  for await (const line of lines) {
+    if (!line.trim()) continue
+    const { id, url } = JSON.parse(line)
+    try {
+      const results = await analyze(wappalyzer, url)
+      write({ id, url, technologies: results.technologies })
+    } catch (error) {
+      write({ id, url, error: String((error && error.message) || error) })
+    }
+    pages += 1
+    if ((recyclePages && pages >= recyclePages) || (recycleRss && treeRss(process.pid) > recycleRss)) {
+      await wappalyzer.destroy().catch(() => {})
+      wappalyzer = await launch()
+      pages = 0
+    }
+  }
+  await wappalyzer.destroy()
+})().catch((error) => {
+  console.error(error)
+  process.exit(1)
+})
+"""
+
+# Short options of the Wappalyzer CLI
+CLI_SHORT_OPTIONS = {'a': 'userAgent', 'b': 'batchSize', 'd': 'debug', 't': 'delay', 'h': 'help', 'H': 'header', 'D': 'maxDepth', 
+    'm': 'maxUrls', 'p': 'probe', 'P': 'pretty', 'r': 'recursive', 'w': 'maxWait', 'n': 'noScripts', 'N': 'noRedirect', 'e': 'extended'}
+
+def cli_args_to_driver_options(args:List[str]) -> dict:
+    """
+    Convert Wappalyzer CLI arguments (ex: `--probe --user-agent="Mozilla/5.0"`) to Wappalyzer driver options (ex: `{"probe": true, "userAgent": "Mozilla/5.0"}`).  
+    `--pretty` is ignored since the output is always JSON lines.  
+    """
+    options = {}
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if not arg.startswith('-'):
+            continue
+        key, _, value = arg.lstrip('-').partition('=')
+        # Short option or value in the next argument
+        if not value and args and not args[0].startswith('-'):
+            value = args.pop(0)
+        key = CLI_SHORT_OPTIONS.get(key) or re.sub(r'-([a-z])', lambda m: m.group(1).upper(), key)
+        if key == 'pretty':
+            continue
+        if not value:
+            options[key] = True
+        elif value.lower() in ('true', 'yes'):
+            options[key] = True
+        elif value.lower() in ('false', 'no'):
+            options[key] = False
+        elif value.isnumeric():
+            options[key] = int(value)
+        else:
+            options[key] = value
+    return options
+
+class _BridgeWorker:
+    """
+    A long-lived Node process running `NODE_BRIDGE_JS`. 
+    """
+    # Marks a line longer than the output limit in the lines queue
+    OVERFLOW = object()
+
+    def __init__(self, cmd:List[str], timeout:int, reaper:ProcessReaper, max_output:int=10485760) -> None:
+        self.cmd = cmd
+        self.reaper = reaper
+        self.max_output = max_output
+        self.process = reaper.popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._lines: 'queue.Queue[Optional[bytes]]' = queue.Queue()
+        threading.Thread(target=self._read_stdout, daemon=True).start()
         try:
-            import Wappalyzer
-        except ImportError:
-            print("Please install python-Wappalyzer.")
-            exit(1)
+            self._receive(lambda message: message.get('ready', False), timeout)
+        except BaseException:
+            self.kill()
+            raise
 
-        self.Wappalyzer = Wappalyzer
-        self._wappalyzer = self.Wappalyzer.Wappalyzer.latest(update=True)
-    
-    def analyze(self, host:str) -> List[Technology]:
+    def _read_stdout(self) -> None:
+        with self.process.stdout:
+            while True:
+                line = self.process.stdout.readline(self.max_output + 1)
+                if not line:
+                    break
+                if len(line) > self.max_output:
+                    self._lines.put(self.OVERFLOW)
+                    break
+                self._lines.put(line)
+        self._lines.put(None)
+
+    def _receive(self, accept, timeout:int) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise subprocess.TimeoutExpired('wappalyzer worker', timeout)
+            if line is None:
+                raise RuntimeError(f"wappalyzer worker exited with code {self.process.wait()}")
+            if line is self.OVERFLOW:
+                raise ResourceLimitExceeded(f"wappalyzer worker output exceeded {self.max_output} bytes")
+            try:
+                message = json.loads(line)
+            except ValueError:
+                # Not a protocol message
+                continue
+            if isinstance(message, dict) and accept(message):
+                return message
+
+    def send(self, messages:List[dict]) -> None:
+        self.process.stdin.write(b''.join(json.dumps(message).encode() + b'\n' for message in messages))
+        self.process.stdin.flush()
+
+    def receive(self, id:int, timeout:int) -> dict:
+        return self._receive(lambda reply: reply.get('id') == id, timeout)
+
+    def request(self, message:dict, timeout:int) -> dict:
+        self.send([message])
+        return self.receive(message['id'], timeout)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def kill(self) -> None:
+        self.reaper.kill(self.process.pid)
+        self.process.wait()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            # Unsent requests
+            pass
+
+    def close(self) -> None:
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+        else:
+            self.reaper.release(self.process.pid)
 
-        results = self._wappalyzer.analyze_with_versions_and_categories(
-            self.Wappalyzer.WebPage.new_from_url(ensure_scheme(host)))
-        
-        techs = []
-        for tech_name, info in results.items():
-            tech = Technology(host, name=tech_name)
-            if info['versions']:
-                tech.version = info['versions'][0]
-            techs.append(tech)
-        return techs
-            
 class JsWappalyzer(IWappalyzer):
-    def __init__(self, path:Optional[str]=None, args:Optional[str]=None, timeout:int=1000) -> None:
+    """
+    Run the Wappalyzer CLI once per URL. 
+    
+    The captured stdout and stderr are capped to `max_output` bytes, a run writing more is killed. 
+    `memory_limit` (in MB) limits the memory of each child process, runs that hit it are recorded as resource failures. 
+    `timeout` is the longest a run can take, `timeouts` can learn shorter per-URL timeouts from the observed run times. 
+    Driver sessions (batches and persistent workers) relaunch their browser after `recycle_pages` pages or `recycle_rss` MB of memory. 
+    `docker_host` is the docker daemon to use (DOCKER_HOST), the local daemon by default. 
+    """
+    def __init__(self, path:Optional[str]=None, args:Optional[str]=None, timeout:int=1000, warm_containers:int=0, 
+                 max_output:int=10485760, memory_limit:Optional[int]=None, timeouts:Optional[TimeoutPolicy]=None, 
+                 recycle_pages:int=100, recycle_rss:int=1024, docker_host:Optional[str]=None) -> None:
+        env = dict(os.environ, DOCKER_HOST=docker_host) if docker_host else None
+        self.docker_host = docker_host
         self.wappalyzerpath = None
         if not path:
             if shutil.which("wappalyzer"):
                 self.wappalyzerpath = [ 'wappalyzer' ]
             elif shutil.which("docker"):
                 # Test if docker image is installed
-                o = subprocess.run( args=[ 'docker', 'image', 'ls' ], stdout=subprocess.PIPE )
+                o = subprocess.run( args=[ 'docker', 'image', 'ls' ], stdout=subprocess.PIPE, env=env )
                 if 'wappalyzer/cli' in o.stdout.decode() :
                     self.wappalyzerpath = [ 'docker', 'run', '--rm', 'wappalyzer/cli' ]
             if self.wappalyzerpath is None:
@@ -215,47 +2643,774 @@ class JsWappalyzer(IWappalyzer):
             self.wappalyzerpath = shlex.split(path)
         self.wappalyzerargs = shlex.split(args) if args else []
         self.timeout = timeout
+        self.timeouts = timeouts or TimeoutPolicy(ceilings={'total': timeout}, floors={'total': 10})
+        self.max_output = max_output
+        self.memory_limit = memory_limit
+        self.recycle_pages = recycle_pages
+        self.recycle_rss = recycle_rss
+        self.reaper = ProcessReaper(memory_limit, env)
+        # Docker image name if the CLI runs with docker
+        self.docker_image: Optional[str] = self.wappalyzerpath[-1] if self.wappalyzerpath[0] == 'docker' else None
+        self._docker_driver_path: Optional[str] = None
+        # Start the containers once for the whole scan
+        self.containers: Optional[DockerContainerPool] = None
+        if self.docker_image and warm_containers:
+            self.containers = DockerContainerPool(self.docker_image, warm_containers, self.reaper)
+
+    def _run(self, cmd:List[str], container:Optional[str]=None) -> subprocess.CompletedProcess:
+        """
+        Run the command in a tracked process group, kill the whole tree on timeout, error or Ctrl-C. 
+        """
+        timeout = self.timeouts.get('total')
+        began = time.monotonic()
+        proc = self.reaper.popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            stdout = _CappedReader(proc.stdout, self.max_output, on_overflow=lambda: self.reaper.kill(proc.pid))
+            stderr = _CappedReader(proc.stderr, self.max_output)
+            proc.wait(timeout=timeout)
+        except BaseException as e:
+            self.reaper.kill(proc.pid)
+            proc.wait()
+            if container and self.containers:
+                self.containers.reset(container)
+            if isinstance(e, subprocess.TimeoutExpired):
+                raise AnalysisTimeout(f"wappalyzer/cli timed out after {timeout:.0f} seconds") from e
+            raise
+        self.reaper.release(proc.pid)
+        stdout.join()
+        stderr.join()
+        if proc.returncode == 0:
+            self.timeouts.observe('total', time.monotonic() - began)
+        return self._completed(cmd, proc.returncode, bytes(stdout.data), bytes(stderr.data), stdout.overflow, container)
+
+    async def _run_async(self, cmd:List[str], container:Optional[str]=None) -> subprocess.CompletedProcess:
+        """
+        Same as `_run()` with asyncio subprocesses: pipes are read without blocking and the timeout is handled by the event loop. 
+        Killing and resetting, which can run docker commands, happen in the default executor so the other analyses go on. 
+        """
+        if self.reaper.closed:
+            raise RuntimeError("The scan is over, not starting new processes")
+        cmd, docker_container = self.reaper.command(cmd)
+        timeout = self.timeouts.get('total')
+        began = time.monotonic()
+        loop = asyncio.get_running_loop()
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True, env=self.reaper.env)
+        self.reaper.track(proc.pid, docker_container, docker=cmd[0] == 'docker')
+        gathering = asyncio.gather(
+                _read_capped_async(proc.stdout, self.max_output, on_overflow=lambda: loop.run_in_executor(None, self.reaper.kill, proc.pid)), 
+                _read_capped_async(proc.stderr, self.max_output), 
+                proc.wait())
+        # Retrieve the error when the analysis is cancelled, ex: hedged analysis
+        gathering.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            (stdout, overflow), (stderr, _), _ = await asyncio.wait_for(gathering, timeout=timeout)
+        except BaseException as e:
+            await loop.run_in_executor(None, self.reaper.kill, proc.pid)
+            await proc.wait()
+            if container and self.containers:
+                await loop.run_in_executor(None, self.containers.reset, container)
+            if isinstance(e, asyncio.TimeoutError):
+                raise AnalysisTimeout(f"wappalyzer/cli timed out after {timeout:.0f} seconds") from e
+            raise
+        self.reaper.release(proc.pid)
+        if proc.returncode == 0:
+            self.timeouts.observe('total', time.monotonic() - began)
+        return await loop.run_in_executor(None, self._completed, cmd, proc.returncode, stdout, stderr, overflow, container)
+
+    def _completed(self, cmd:List[str], returncode:int, stdout:bytes, stderr:bytes, overflow:bool, container:Optional[str]) -> subprocess.CompletedProcess:
+        """
+        Check the resource limits of a finished run. 
+        """
+        if (overflow or returncode < 0) and container and self.containers:
+            # Killed docker exec client
+            self.containers.reset(container)
+        if overflow:
+            raise ResourceLimitExceeded(f"wappalyzer/cli output exceeded {self.max_output} bytes")
+        # Docker OOM kill or failed allocation under RLIMIT_DATA
+        if returncode != 0 and self.memory_limit and (returncode == 137 or 
+                re.search(rb'out of memory|allocation failed|cannot allocate memory', stderr, re.I)):
+            raise ResourceLimitExceeded(f"wappalyzer/cli exceeded the memory limit of {self.memory_limit} MB")
+        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+    def _command(self, host:str, container:Optional[str]=None) -> List[str]:
+        if container:
+            return [ 'docker', 'exec', container ] + self.containers.command + [ensure_scheme(host)] + self.wappalyzerargs
+        return self.wappalyzerpath + [ensure_scheme(host)] + self.wappalyzerargs
 
     def analyze(self, host:str) -> List[Technology]:
-        cmd = self.wappalyzerpath + [ensure_scheme(host)] + self.wappalyzerargs
-        p = subprocess.run(args=cmd, timeout=self.timeout, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
+        if self.containers:
+            with self.containers.container() as name:
+                p = self._run(self._command(host, name), container=name)
+        else:
+            p = self._run(self._command(host))
+        return self._parse_output(host, p)
+
+    async def analyze_async(self, host:str) -> List[Technology]:
+        if self.containers:
+            name = await self.containers.acquire_async()
+            try:
+                p = await self._run_async(self._command(host, name), container=name)
+            finally:
+                self.containers.release(name)
+        else:
+            p = await self._run_async(self._command(host))
+        return self._parse_output(host, p)
+
+    def analyze_many(self, hosts:List[str]) -> List[Union[List[Technology], AnalysisError]]:
+        """
+        Analyze the hosts with a single Wappalyzer driver session, so the Node start and the browser launch are paid once per batch. 
+        The session answers in order: if it dies or times out while analyzing a host, this host fails and a new session 
+        analyzes the hosts left. If the session can't start, a new session is started once, then all the hosts fail with 
+        a `BackendError`. 
+        """
+        if self.containers:
+            with self.containers.container() as name:
+                return self._analyze_batch(hosts, self._get_bridge_command(name), container=name)
+        return self._analyze_batch(hosts, self._get_bridge_command())
+
+    def _analyze_batch(self, hosts:List[str], cmd:List[str], container:Optional[str]=None, 
+                       retries:int=1) -> List[Union[List[Technology], AnalysisError]]:
+        results: List[Union[List[Technology], AnalysisError]] = []
+        if not hosts:
+            return results
+        worker = None
+        # True once the session is answering: a failure is then caused by the host waited for
+        receiving = False
+        try:
+            worker = _BridgeWorker(cmd, self.timeout, self.reaper, self.max_output)
+            requests = [ {'id': i, 'url': ensure_scheme(host)} for i, host in enumerate(hosts) ]
+            worker.send(requests)
+            receiving = True
+            for host, request in zip(hosts, requests):
+                began = time.monotonic()
+                reply = worker.receive(request['id'], self.timeouts.get('total'))
+                self.timeouts.observe('total', time.monotonic() - began)
+                try:
+                    results.append(self._parse_reply(host, reply))
+                except AnalysisError as e:
+                    results.append(e)
+            worker.close()
+        except (subprocess.TimeoutExpired, RuntimeError, OSError, AnalysisError) as e:
+            if worker:
+                worker.kill()
+            if container and self.containers:
+                self.containers.reset(container)
+            left = hosts[len(results):]
+            if not receiving:
+                # The session could not start, no host is the cause: ex: a flaky browser launch, try a new one
+                if retries > 0 and not self.reaper.closed:
+                    return self._analyze_batch(hosts, cmd, container, retries - 1)
+                error = e if isinstance(e, BackendError) else BackendError(f"wappalyzer/cli session failed: {e}")
+                results.extend(error for _ in left)
+            elif left:
+                if isinstance(e, AnalysisError):
+                    results.append(e)
+                elif isinstance(e, subprocess.TimeoutExpired):
+                    results.append(AnalysisTimeout(f"wappalyzer/cli timed out after {e.timeout:.0f} seconds"))
+                else:
+                    results.append(BackendError(f"wappalyzer/cli failed: {e}"))
+                if not self.reaper.closed:
+                    results.extend(self._analyze_batch(hosts[len(results):], cmd, container))
+        # The scan is over, the hosts left were not analyzed
+        return results + [ BackendError("The scan is over, not analyzing") for _ in hosts[len(results):] ]
+
+    def _get_bridge_command(self, container:Optional[str]=None) -> List[str]:
+        """
+        Return the command that runs `NODE_BRIDGE_JS`, in the given warm container if any. 
+        """
+        options = [ json.dumps(cli_args_to_driver_options(self.wappalyzerargs)), 
+            json.dumps({'recyclePages': self.recycle_pages, 'recycleRss': self.recycle_rss}) ]
+        if container:
+            return [ 'docker', 'exec', '-i', container, 'node', '-e', NODE_BRIDGE_JS, self._get_docker_driver_path() ] + options
+        if self.docker_image:
+            return [ 'docker', 'run', '-i', '--rm', '--entrypoint', 'node', self.docker_image, 
+                '-e', NODE_BRIDGE_JS, self._get_docker_driver_path() ] + options
+        # The driver module lives next to the CLI script
+        cli = os.path.realpath(shutil.which(self.wappalyzerpath[-1]) or self.wappalyzerpath[-1])
+        return [ 'node', '-e', NODE_BRIDGE_JS, os.path.join(os.path.dirname(cli), 'driver.js') ] + options
+
+    def _get_docker_driver_path(self) -> str:
+        if not self._docker_driver_path:
+            self._docker_driver_path = '/opt/wappalyzer/driver.js'
+            config = docker_image_config(self.docker_image, self.reaper.env)
+            for arg in docker_image_command(config):
+                if arg.endswith('cli.js'):
+                    self._docker_driver_path = posixpath.join(config.get('WorkingDir') or '/', posixpath.dirname(arg), 'driver.js')
+        return self._docker_driver_path
+
+    def _parse_reply(self, host:str, reply:dict) -> List[Technology]:
+        """
+        Return the technologies of a reply of a driver session, raise `AnalysisError` if it is an error or is invalid. 
+        """
+        if 'error' in reply:
+            raise AnalysisError(f"wappalyzer/cli failed: {reply['error']}")
+        try:
+            return self._parse_technologies(host, reply['technologies'])
+        except (KeyError, TypeError, AttributeError) as e:
+            raise AnalysisError(f"wappalyzer/cli failed: invalid reply {reply!r}") from e
+
+    def _parse_output(self, host:str, p:subprocess.CompletedProcess) -> List[Technology]:
         if p.returncode == 0:
             result = json.loads(p.stdout)
+        elif p.args[0] == 'docker' and p.returncode in (125, 126, 127):
+            # The docker command failed, not the analysis
+            raise BackendError(f"docker failed: {p.stderr}")
         else:
-            print(f"wappalyzer/cli failed: {p.stdout}\n{p.stderr}")
-            return []
+            raise AnalysisError(f"wappalyzer/cli failed: {p.stdout}\n{p.stderr}")
         
+        return self._parse_technologies(host, result['technologies'])
+    
+    def close(self) -> None:
+        if self.containers:
+            self.containers.close()
+        self.reaper.sweep()
+
+    @staticmethod
+    def _parse_technologies(host:str, technologies:List[dict]) -> List[Technology]:
         techs = []
-        for r in result['technologies']:
-            t = Technology(host, name=r['name'], version=r['version'] or None)
+        for r in technologies:
+            t = Technology(host, name=r['name'], version=r['version'] or None, 
+                categories=[ c.get('name', '') for c in r.get('categories') or () ])
             techs.append(t)
         return techs
 
+class JsWappalyzerPool(JsWappalyzer):
+    """
+    Keep `workers` long-lived Wappalyzer driver processes running and send them URLs over stdin/stdout, 
+    so the Node start, the module load and the headless browser launch are paid once per worker instead of once per URL. 
+    """
+    def __init__(self, path:Optional[str]=None, args:Optional[str]=None, timeout:int=1000, workers:int=5, 
+                 max_output:int=10485760, memory_limit:Optional[int]=None, timeouts:Optional[TimeoutPolicy]=None, 
+                 recycle_pages:int=100, recycle_rss:int=1024, docker_host:Optional[str]=None) -> None:
+        super().__init__(path, args, timeout, max_output=max_output, memory_limit=memory_limit, timeouts=timeouts, 
+            recycle_pages=recycle_pages, recycle_rss=recycle_rss, docker_host=docker_host)
+        self.bridgecmd = self._get_bridge_command()
+        self._ids = itertools.count()
+        self._workers: List[_BridgeWorker] = []
+        self._lock = threading.Lock()
+        # Idle workers, None means the worker is not started yet (or died)
+        self._idle: 'queue.Queue[Optional[_BridgeWorker]]' = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(None)
+
+    def _spawn(self) -> _BridgeWorker:
+        worker = _BridgeWorker(self.bridgecmd, self.timeout, self.reaper, self.max_output)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _discard(self, worker:_BridgeWorker) -> None:
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def analyze(self, host:str) -> List[Technology]:
+        if self.reaper.closed:
+            raise BackendError("The scan is over, not analyzing")
+        attempt = Attempt.current()
+        worker = self._idle.get()
+        if attempt and attempt.cancelled:
+            # Lost a hedge while waiting for a worker, keep the worker for the next host
+            self._idle.put(worker)
+            raise AnalysisError("analysis cancelled")
+        try:
+            if worker is None or not worker.alive():
+                if worker:
+                    self._discard(worker)
+                worker = None
+                worker = self._spawn()
+            began = time.monotonic()
+            timeout = self.timeouts.get('total')
+            if attempt:
+                attempt.add(worker, worker.kill)
+            try:
+                reply = worker.request({'id': next(self._ids), 'url': ensure_scheme(host)}, timeout)
+            finally:
+                if attempt:
+                    attempt.discard(worker)
+            self.timeouts.observe('total', time.monotonic() - began)
+        except (subprocess.TimeoutExpired, RuntimeError, OSError, AnalysisError) as e:
+            if worker:
+                self._discard(worker)
+                worker = None
+            if isinstance(e, AnalysisError):
+                raise
+            if isinstance(e, subprocess.TimeoutExpired):
+                raise AnalysisTimeout(f"wappalyzer/cli worker timed out after {e.timeout:.0f} seconds") from e
+            raise BackendError(f"wappalyzer/cli worker failed: {e}") from e
+        finally:
+            self._idle.put(worker)
+
+        return self._parse_reply(host, reply)
+
+    async def analyze_async(self, host:str) -> List[Technology]:
+        # Workers are blocking, run the request in the event loop default executor
+        return await IWappalyzer.analyze_async(self, host)
+
+    def analyze_many(self, hosts:List[str]) -> List[Union[List[Technology], AnalysisError]]:
+        # Workers are already long-lived
+        return IWappalyzer.analyze_many(self, hosts)
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+        super().close()
+
+class _Backend:
+    """
+    An analyzer of a `BackendPool` and its statistics. 
+    """
+    def __init__(self, name:str, wappalyzer:IWappalyzer) -> None:
+        self.name = name
+        self.wappalyzer = wappalyzer
+        # Moving averages of the seconds per host and of the rate of hosts analyzed, failures included, 
+        # the latency is None until the first analysis is over
+        self.latency: Optional[float] = None
+        self.success = 1.0
+        self.inflight = 0
+        # Failures of the analyzer in a row, failures of any kind in a row
+        self.failures = 0
+        self.streak = 0
+        self.disabled_until = 0.0
+
+class BackendPool(IWappalyzer):
+    """
+    Spread the hosts across several analyzers, weighted by their measured throughput. 
+    
+    Each host goes to the analyzer with the lowest expected time per analyzed host: (analyses in flight + 1) x average latency 
+    / success rate. Analyzers without measure are tried first, `probes` hosts at a time. 
+    An analyzer is taken out of rotation for `cooldown` seconds, then tried again, when it fails `max_failures` times in a row 
+    because of itself (see `_faulty()`), or when it fails `max_streak` hosts in a row for any reason (unreachable site, 
+    site timeout, error reported by Wappalyzer) and another analyzer is in rotation. 
+    """
+    def __init__(self, backends:List[Tuple[str, IWappalyzer]], max_failures:int=5, cooldown:float=300, probes:int=2, 
+                 max_streak:int=20) -> None:
+        self.backends = [ _Backend(name, wappalyzer) for name, wappalyzer in backends ]
+        self.max_failures = max_failures
+        self.max_streak = max_streak
+        self.cooldown = cooldown
+        self.probes = probes
+        self._lock = threading.Lock()
+
+    def _cost(self, backend:_Backend) -> Tuple[float, int]:
+        if backend.latency is None:
+            return (0 if backend.inflight < self.probes else math.inf, backend.inflight)
+        return ((backend.inflight + 1) * backend.latency / max(backend.success, 0.01), backend.inflight)
+
+    def _acquire(self) -> _Backend:
+        with self._lock:
+            now = time.monotonic()
+            healthy = [ b for b in self.backends if b.disabled_until <= now ]
+            if not healthy:
+                # All out of rotation, use the one coming back first
+                healthy = [ min(self.backends, key=lambda b: b.disabled_until) ]
+            attempt = Attempt.current()
+            if attempt and attempt.avoid:
+                # Hedged attempt, use another backend if possible
+                healthy = [ b for b in healthy if b is not attempt.avoid ] or healthy
+            backend = min(healthy, key=self._cost)
+            backend.inflight += 1
+            if attempt:
+                attempt.backend = backend
+            return backend
+
+    @staticmethod
+    def _faulty(error) -> bool:
+        """
+        True if the error is a failure of the analyzer rather than of the host. 
+        """
+        return not isinstance(error, AnalysisError) or isinstance(error, (BackendError, ResourceLimitExceeded))
+
+    def _release(self, backend:_Backend, latency:Optional[float], success:float=1, faulty:bool=False) -> None:
+        """
+        Record the outcome of an analysis: the seconds per host, None if it was interrupted, and the rate of hosts analyzed. 
+        Only the failures of the analyzer (faulty) can take it out of rotation. 
+        """
+        attempt = Attempt.current()
+        with self._lock:
+            backend.inflight -= 1
+            if latency is None or (attempt and attempt.cancelled):
+                # Interrupted or lost a hedge, not the backend's fault
+                return
+            backend.latency = latency if backend.latency is None else 0.8 * backend.latency + 0.2 * latency
+            backend.success = 0.8 * backend.success + 0.2 * success
+            if success > 0:
+                backend.failures = backend.streak = 0
+            else:
+                backend.streak += 1
+                backend.failures += faulty
+            if backend.failures >= self.max_failures:
+                self._disable(backend, f"after {self.max_failures} failures")
+            elif backend.streak >= self.max_streak and any(b is not backend and b.disabled_until <= time.monotonic() for b in self.backends):
+                # The last analyzer in rotation is kept, the hosts may be failing
+                self._disable(backend, f"after failing {backend.streak} hosts in a row")
+
+    def _disable(self, backend:_Backend, why:str) -> None:
+        backend.failures = backend.streak = 0
+        backend.disabled_until = time.monotonic() + self.cooldown
+        print(f"Taking {backend.name} out of rotation for {self.cooldown:.0f} seconds {why}")
+
+    @contextlib.contextmanager
+    def _backend(self):
+        """
+        Context manager that yields the analyzer to use for a host and records the outcome. 
+        """
+        backend = self._acquire()
+        began = time.monotonic()
+        try:
+            yield backend
+        except Exception as e:
+            self._release(backend, time.monotonic() - began, 0, self._faulty(e))
+            raise
+        except BaseException:
+            self._release(backend, None)
+            raise
+        self._release(backend, time.monotonic() - began)
+
+    def analyze(self, host:str) -> List[Technology]:
+        with self._backend() as backend:
+            return backend.wappalyzer.analyze(host)
+
+    async def analyze_async(self, host:str) -> List[Technology]:
+        with self._backend() as backend:
+            return await backend.wappalyzer.analyze_async(host)
+
+    def analyze_many(self, hosts:List[str]) -> List[Union[List[Technology], AnalysisError]]:
+        backend = self._acquire()
+        began = time.monotonic()
+        try:
+            results = backend.wappalyzer.analyze_many(hosts)
+        except Exception as e:
+            self._release(backend, (time.monotonic() - began) / max(len(hosts), 1), 0, self._faulty(e))
+            raise
+        except BaseException:
+            self._release(backend, None)
+            raise
+        # The failures are returned per host, the analyzer fails if no host could be analyzed because of it
+        analyzed = sum(not isinstance(r, AnalysisError) for r in results)
+        self._release(backend, (time.monotonic() - began) / max(len(hosts), 1), analyzed / max(len(hosts), 1), 
+            not analyzed and any(self._faulty(r) for r in results))
+        return results
+
+    @property
+    def fingerprints(self) -> Optional[str]:
+        return ','.join(sorted({ b.wappalyzer.fingerprints for b in self.backends if b.wappalyzer.fingerprints })) or None
+
+    @property
+    def truncated(self) -> Dict[str, str]:
+        truncated: Dict[str, str] = {}
+        for backend in self.backends:
+            truncated.update(backend.wappalyzer.truncated)
+        return truncated
+
+    def set_adaptive_timeouts(self, adaptive:bool) -> None:
+        for backend in self.backends:
+            backend.wappalyzer.set_adaptive_timeouts(adaptive)
+
+    def set_longest_timeouts(self) -> None:
+        for backend in self.backends:
+            backend.wappalyzer.set_longest_timeouts()
+
+    def close(self) -> None:
+        for backend in self.backends:
+            backend.wappalyzer.close()
+
+    async def aclose(self) -> None:
+        for backend in self.backends:
+            await backend.wappalyzer.aclose()
+
+class HedgedWappalyzer(IWappalyzer):
+    """
+    Hedge slow analyses to cut tail latency: when an analysis runs longer than the `quantile` of the observed latencies, 
+    a second attempt is started (on another backend of a `BackendPool` if possible) and the first to finish wins. 
+    The other attempt is cancelled: its processes or worker are killed. 
+    
+    At most `ratio` hedges per analysis are started, ex: 0.05 caps the extra load to 5%. 
+    Nothing is hedged until `min_samples` latencies are observed. 
+    
+    A losing python-Wappalyzer download can't be interrupted, it keeps its thread until it's over: hedges are only started 
+    while fewer than `workers` attempts run on top of the analyses in progress, so the analyses never wait for a thread. 
+    """
+    def __init__(self, wappalyzer:IWappalyzer, ratio:float=0.05, workers:int=5, quantile:float=0.95, min_samples:int=20) -> None:
+        self.wappalyzer = wappalyzer
+        self.ratio = ratio
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.latencies = LatencySketch()
+        self.analyses = 0
+        self.hedges = 0
+        self.workers = workers
+        # Analyses in progress and attempts running in the executor, see analyze()
+        self._active = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        # Each analysis and its hedge or a losing attempt still running
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers * 2)
+
+    def _hedge_delay(self) -> Optional[float]:
+        """
+        Return how long to wait before hedging, None to not hedge. 
+        """
+        with self._lock:
+            self.analyses += 1
+        if self.ratio <= 0 or self.latencies.count < self.min_samples:
+            return None
+        return self.latencies.quantile(self.quantile)
+
+    def _take_hedge(self, threads:bool=False) -> bool:
+        with self._lock:
+            if threads and self._running - self._active >= self.workers:
+                # The executor threads are taken by the analyses in progress, their hedges and the losers still running
+                return False
+            if self.hedges < self.ratio * self.analyses:
+                self.hedges += 1
+                return True
+            return False
+
+    def _submit(self, attempt:Attempt, host:str) -> concurrent.futures.Future:
+        with self._lock:
+            self._running += 1
+        future = self._executor.submit(attempt.run, self.wappalyzer.analyze, host)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future:concurrent.futures.Future) -> None:
+        with self._lock:
+            self._running -= 1
+
+    def analyze(self, host:str) -> List[Technology]:
+        began = time.monotonic()
+        with self._lock:
+            self._active += 1
+        try:
+            primary = Attempt()
+            attempts = { self._submit(primary, host): primary }
+            delay = self._hedge_delay()
+            if delay is not None:
+                done, _ = concurrent.futures.wait(attempts, timeout=delay)
+                if not done and self._take_hedge(threads=True):
+                    hedge = Attempt(avoid=primary.backend)
+                    attempts[self._submit(hedge, host)] = hedge
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        for other in pending:
+                            attempts[other].cancel()
+                        self.latencies.add(time.monotonic() - began)
+                        return future.result()
+                    error = error or future.exception()
+            raise error
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    async def analyze_async(self, host:str) -> List[Technology]:
+        began = time.monotonic()
+        primary = Attempt()
+        attempts = { asyncio.ensure_future(primary.run_async(self.wappalyzer.analyze_async, host)): primary }
+        delay = self._hedge_delay()
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and self._take_hedge():
+                    hedge = Attempt(avoid=primary.backend)
+                    task = asyncio.ensure_future(hedge.run_async(self.wappalyzer.analyze_async, host))
+                    attempts[task] = hedge
+                    pending.add(task)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies.add(time.monotonic() - began)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            loop = asyncio.get_running_loop()
+            for task in pending:
+                # The callbacks kill processes and workers, which blocks
+                loop.run_in_executor(None, attempts[task].cancel)
+                task.cancel()
+
+    def analyze_many(self, hosts:List[str]) -> List[Union[List[Technology], AnalysisError]]:
+        return self.wappalyzer.analyze_many(hosts)
+
+    @property
+    def fingerprints(self) -> Optional[str]:
+        return self.wappalyzer.fingerprints
+
+    @property
+    def truncated(self) -> Dict[str, str]:
+        return self.wappalyzer.truncated
+
+    def set_adaptive_timeouts(self, adaptive:bool) -> None:
+        self.wappalyzer.set_adaptive_timeouts(adaptive)
+
+    def set_longest_timeouts(self) -> None:
+        self.wappalyzer.set_longest_timeouts()
+
+    def close(self) -> None:
+        self.wappalyzer.close()
+        shutdown_executor(self._executor, wait=False)
+
+    async def aclose(self) -> None:
+        await self.wappalyzer.aclose()
+
 class WappalyzerWrapper(object):
 
-    def __init__(self, wappalyzerpath=None, wappalyzerargs=None, python=False):
-        self._analyze = None
+    def __init__(self, wappalyzerpath=None, wappalyzerargs=None, python=False, persistent=False, warm_containers=False, workers=5, 
+                 max_output=10485760, memory_limit=None, timeout=1000, adaptive_timeouts=False, recycle_pages=100, recycle_rss=1024, 
+                 backends=None, hedge=0, cache_dir=None, fingerprints_url=None, fingerprints_ttl=24, offline=False, regex_engine='re', 
+                 pool_hosts=100, pool_size=0, processes=0, max_body=10485760, max_read_time=30, 
+                 stream_idle=0, only=None, analyze_batch=1):
+        self._wappalyzer: Optional[IWappalyzer] = None
+        self._fingerprints = FingerprintDB(cache_dir=cache_dir, url=fingerprints_url, ttl=fingerprints_ttl, offline=offline)
+        self._regex_engine = regex_engine
+        # Hedged attempts can double the number of concurrent fetches and analyses
+        threads = workers * (2 if hedge > 0 else 1)
+        self._python_options = dict(timeout=timeout, pool_hosts=pool_hosts, pool_size=pool_size or threads, 
+            processes=processes, max_body=max_body, max_read_time=max_read_time, stream_idle=stream_idle, only=only, 
+            analyze_batch=analyze_batch, workers=threads)
+        options = dict(args=wappalyzerargs, persistent=persistent, warm_containers=warm_containers, workers=workers, 
+            max_output=max_output, memory_limit=memory_limit, timeout=timeout, recycle_pages=recycle_pages, recycle_rss=recycle_rss)
         
-        if not python:
+        if backends:
+            self._wappalyzer = BackendPool([ (spec, self._get_backend(spec, **options)) for spec in backends ])
+        elif not python:
             try:
-                wap = JsWappalyzer(path=wappalyzerpath, args=wappalyzerargs)
-                self._analyze = wap.analyze
-                print("Using wappalyzer/cli: {}".format(' '.join(wap.wappalyzerpath)))
+                self._wappalyzer = self._get_js_wappalyzer(wappalyzerpath, **options)
             except RuntimeError:
                 pass
-        if not self._analyze:
+        if not self._wappalyzer:
             print("Using python-Wappalyzer")
-            self._analyze = PythonWappalyzer().analyze
-            
+            self._wappalyzer = PythonWappalyzer(fingerprints=self._fingerprints, regex_engine=self._regex_engine, **self._python_options)
+        
+        self._wappalyzer.set_adaptive_timeouts(adaptive_timeouts)
+        
+        if hedge > 0:
+            print(f"Hedging up to {hedge}% of the analyses")
+            self._wappalyzer = HedgedWappalyzer(self._wappalyzer, ratio=hedge / 100, workers=workers)
         
         self.results: List[List[Technology]] = []
+        # host -> (failure reason, message)
+        self.failures: Dict[str, Tuple[str, str]] = {}
+
+    @staticmethod
+    def _get_js_wappalyzer(path, persistent=False, warm_containers=False, workers=5, docker_host=None, **kwargs) -> JsWappalyzer:
+        if persistent:
+            wap = JsWappalyzerPool(path=path, workers=workers, docker_host=docker_host, **kwargs)
+            print("Using {} persistent wappalyzer/cli workers: {}".format(workers, ' '.join(wap.wappalyzerpath)))
+        else:
+            wap = JsWappalyzer(path=path, warm_containers=workers if warm_containers else 0, docker_host=docker_host, **kwargs)
+            if wap.containers:
+                print("Using {} warm wappalyzer/cli containers: {}".format(len(wap.containers.names), wap.docker_image))
+            else:
+                print("Using wappalyzer/cli: {}".format(' '.join(wap.wappalyzerpath)))
+        if docker_host:
+            print(f"  on docker host {docker_host}")
+        return wap
+
+    def _get_backend(self, spec:str, **options) -> IWappalyzer:
+        """
+        Return the analyzer of a backend specification: 'python', 'npm', 'docker', 'docker@<DOCKER_HOST>' or the path of the CLI. 
+        """
+        if spec == 'python':
+            print("Using python-Wappalyzer")
+            return PythonWappalyzer(fingerprints=self._fingerprints, regex_engine=self._regex_engine, **self._python_options)
+        if spec == 'npm':
+            return self._get_js_wappalyzer('wappalyzer', **options)
+        if spec == 'docker' or spec.startswith('docker@'):
+            _, _, docker_host = spec.partition('@')
+            return self._get_js_wappalyzer('docker run --rm wappalyzer/cli', docker_host=docker_host or None, **options)
+        return self._get_js_wappalyzer(spec, **options)
+
+    @property
+    def fingerprints(self) -> Optional[str]:
+        return self._wappalyzer.fingerprints
+
+    @property
+    def truncated(self) -> Dict[str, str]:
+        return self._wappalyzer.truncated
+
+    def set_adaptive_timeouts(self, adaptive:bool) -> None:
+        self._wappalyzer.set_adaptive_timeouts(adaptive)
+
+    def set_longest_timeouts(self) -> None:
+        self._wappalyzer.set_longest_timeouts()
+
+    def _failed(self, host, error:AnalysisError) -> List[Technology]:
+        print(f"Could not analyze {host}: {error}")
+        self.failures[host] = (error.reason, str(error))
+        return []
 
     def analyze(self, host) -> List[Technology]:    
-        techs = self._analyze(host)
+        try:
+            techs = self._wappalyzer.analyze(host)
+        except AnalysisError as e:
+            techs = self._failed(host, e)
+        self.results.append(techs)
+        return techs
+    
+    async def analyze_async(self, host) -> List[Technology]:
+        try:
+            techs = await self._wappalyzer.analyze_async(host)
+        except AnalysisError as e:
+            techs = self._failed(host, e)
         self.results.append(techs)
         return techs
     
+    def analyze_many(self, hosts) -> List[List[Technology]]:
+        results = [ self._failed(host, r) if isinstance(r, AnalysisError) else r 
+            for host, r in zip(hosts, self._wappalyzer.analyze_many(hosts)) ]
+        self.results.extend(results)
+        return results
+    
+    def close(self) -> None:
+        self._wappalyzer.close()
+
+    async def aclose(self) -> None:
+        await self._wappalyzer.aclose()
+
+    @property
+    def pipelined(self) -> bool:
+        """
+        True if downloads and analyses can run in separate stages, see `download()` and `analyze_pages()`. 
+        """
+        return self._python is not None
+
+    @property
+    def _python(self) -> Optional[PythonWappalyzer]:
+        """
+        The python-Wappalyzer analyzer, hedged or not, None if another one is used. 
+        """
+        wappalyzer = self._wappalyzer.wappalyzer if isinstance(self._wappalyzer, HedgedWappalyzer) else self._wappalyzer
+        return wappalyzer if isinstance(wappalyzer, PythonWappalyzer) else None
+
+    def download(self, host) -> Optional[Tuple[str, bytes, dict]]:
+        try:
+            return self._python.download(host)
+        except AnalysisError as e:
+            self._failed(host, e)
+            return None
+
+    def analyze_pages(self, hosts, pages:List[Optional[Tuple[str, bytes, dict]]]) -> List[List[Technology]]:
+        results: List[List[Technology]] = [ [] for _ in hosts ]
+        # The pages that could not be downloaded are failures
+        downloaded = [ i for i, page in enumerate(pages) if page ]
+        if downloaded:
+            for i, techs in zip(downloaded, self._python.analyze_pages([ hosts[i] for i in downloaded ], [ pages[i] for i in downloaded ])):
+                results[i] = techs
+        self.results.extend(results)
+        return results
+    
 class MassWappalyzer(object):
 
     def __init__(self, 
@@ -263,6 +3418,14 @@ class MassWappalyzer(object):
         outputfile,  
         asynch_workers=5, 
         outputformat="xlsx",
+        engine="threads",
+        batch_size=0,
+        retry_timeouts=False,
+        analyze_workers=0,
+        queue_size=0,
+        analyze_batch=32,
+        only_tech=None,
+        only_category=None,
         **kwargs):
 
         print('Mass Wappalyzer')
@@ -279,22 +3442,86 @@ class MassWappalyzer(object):
         
         self.outputformat=outputformat
         self.asynch_workers=asynch_workers
+        self.engine=engine
+        self.batch_size=batch_size
+        self.retry_timeouts=retry_timeouts
+        self.analyze_workers=analyze_workers or os.cpu_count() or 1
+        self.queue_size=queue_size or max(self.analyze_workers * 2, analyze_batch)
+        self.analyze_batch=analyze_batch
+        # Only these technologies are reported, python-Wappalyzer only matches their fingerprints
+        self.only=TechnologyFilter(only_tech, only_category) if only_tech or only_category else None
 
         self.analyzer = WappalyzerWrapper(
+            workers=asynch_workers,
+            only=self.only,
+            analyze_batch=analyze_batch,
             **kwargs)
 
-    def run(self):
-
-        try:
+        if self.engine == 'pipeline':
+            if self.analyzer.pipelined:
+                print(f"Downloading with {self.asynch_workers} workers, analyzing with {self.analyze_workers} workers")
+                if kwargs.get('hedge'):
+                    print("The downloads of the pipeline engine are not hedged")
+            else:
+                print("The pipeline engine only applies to python-Wappalyzer, using threads")
+                self.engine = 'threads'
 
-            raw_results = async_do(
+    def _analyze(self, urls):
+        if self.batch_size > 1:
+            return batch_do(
+                self.analyzer.analyze_many, 
+                AdaptiveBatcher(urls, maximum=self.batch_size), 
+                workers=self.asynch_workers, 
+                progress=True,
+                desc="Analyzing...")
+        elif self.engine == 'asyncio':
+            return asyncio_do(
+                self.analyzer.analyze_async, 
+                urls, 
+                workers=self.asynch_workers, 
+                progress=True,
+                desc="Analyzing...", 
+                finalize=self.analyzer.aclose)
+        elif self.engine == 'pipeline':
+            stats = PipelineStats(self.queue_size)
+            try:
+                return pipeline_do(
+                    self.analyzer.download, 
+                    self.analyzer.analyze_pages, 
+                    urls, 
+                    producers=self.asynch_workers, 
+                    consumers=self.analyze_workers, 
+                    size=self.queue_size, 
+                    batch=self.analyze_batch, 
+                    progress=True,
+                    desc="Analyzing...", 
+                    stats=stats)
+            finally:
+                print(f"Pipeline: {stats}")
+        else:
+            return async_do(
                 self.analyzer.analyze, 
-                self.urls, 
+                urls, 
                 asynch=True, 
                 workers=self.asynch_workers, 
                 progress=True,
                 desc="Analyzing...")
 
+    def run(self):
+
+        try:
+
+            raw_results = self._analyze(self.urls)
+
+            # Analyze the timed out URLs again with the longest timeouts
+            timed_out = [ host for host, (reason, _) in self.analyzer.failures.items() if reason == 'timeout' ]
+            if self.retry_timeouts and timed_out:
+                print(f"Retrying {len(timed_out)} timed out URLs")
+                self.analyzer.set_longest_timeouts()
+                for host in timed_out:
+                    del self.analyzer.failures[host]
+                raw_results = raw_results + self._analyze(timed_out)
+
         except KeyboardInterrupt:
             print("Quitting...")
             raw_results = self.analyzer.results
@@ -305,6 +3532,11 @@ class MassWappalyzer(object):
 
         finally:
 
+            self.analyzer.close()
+
+            if self.only:
+                raw_results = [ [ item for item in items if self.only(item) ] for items in raw_results ]
+
             # Find the template Website keys and init a new class dynamically
             # Keys: urls, applications meta
             all_apps = set()
@@ -312,6 +3544,20 @@ class MassWappalyzer(object):
                 for item in items:
                     all_apps.add(clean(item.name))
             
+            if self.analyzer.failures:
+                print("Failed analyses: ")
+                for host, (reason, message) in self.analyzer.failures.items():
+                    print(f"{host}: {reason}: {message}")
+
+            if self.analyzer.fingerprints:
+                print(f"Fingerprint database: {self.analyzer.fingerprints}")
+
+            truncated = self.analyzer.truncated
+            if truncated:
+                print("Truncated pages, analyzed on the received part: ")
+                for host, limit in truncated.items():
+                    print(f"{host}: {limit}")
+
             print("All technologies seen: ")
             all_apps = sorted(all_apps)
             print(all_apps)
@@ -329,6 +3575,10 @@ class MassWappalyzer(object):
                     website_dict.update( {clean(item.name): f'Detected{(", version "+item.version) if item.version else ""}'} )
                     # Append dict to structure
                 
+                if self.analyzer.fingerprints:
+                    website_dict['Fingerprints'] = self.analyzer.fingerprints
+                if truncated:
+                    website_dict['Truncated'] = truncated.get(items[0].url, '')
                 excel_structure.append(ensure_keys(website_dict, all_apps))
 
             if not excel_structure:
@@ -366,8 +3616,7 @@ def parse_arguments():
     parser.add_argument(
         '-i', '--inputfile', 
         metavar='Input file', 
-        help='Input file, the file must contain 1 host URL per line.', 
-        required=True)
+        help='Input file, the file must contain 1 host URL per line.')
     parser.add_argument('-o', '--outputfile', 
         metavar="Output file", 
         help='Output file containning all Wappalyzer informations. ', 
@@ -388,16 +3637,150 @@ def parse_arguments():
         metavar="Number", 
         help='Number of websites to analyze at the same time', 
         default=5, type=int)
+    parser.add_argument('-e', '--engine', 
+        metavar="Engine", 
+        help="Indicate how websites are analyzed concurrently. Choices: 'threads' (one thread per worker), 'asyncio' (all wappalyzer/cli processes or python-Wappalyzer downloads driven by a single event loop thread, use with a high number of workers), 'pipeline' (python-Wappalyzer only: the workers download the pages into a queue, analyzed by --analyze_workers threads).", 
+        default='threads', 
+        choices=['threads', 'asyncio', 'pipeline'])
+    parser.add_argument('--analyze_workers', 
+        metavar="Number", 
+        help="Number of threads analyzing the downloaded pages with the 'pipeline' engine. Default: the number of CPU cores.", 
+        default=0, type=int)
+    parser.add_argument('--queue_size', 
+        metavar="Number", 
+        help="Maximum number of downloaded pages waiting to be analyzed with the 'pipeline' engine, downloads pause when the queue is full. Default: twice the number of analyze workers, at least --analyze_batch.", 
+        default=0, type=int)
+    parser.add_argument('--analyze_batch', 
+        metavar="Number", 
+        help="With python-Wappalyzer, analyze up to this many downloaded pages at once, the header, script and meta values they share are matched once. With the 'pipeline' engine, the batches are taken from the queue; with the 'threads' engine, from the pages the workers downloaded while the previous batches were analyzed: one batch at a time with the 're' engine, one per worker with 're2' or 'hyperscan', one per process with --processes. Not applied by the 'asyncio' engine.", 
+        default=32, type=int)
+    parser.add_argument('-b', '--batch_size', 
+        metavar="Number", 
+        help='Analyze websites in batches of at most this many URLs per Wappalyzer driver session, the batch size adapts to the observed analysis time. Disabled if lower than 2.', 
+        default=0, type=int)
+    parser.add_argument('--backends', 
+        metavar="Backends", 
+        help='Comma separated list of analysis backends to spread the websites across, weighted by their measured throughput: "python", "npm", "docker", "docker@<DOCKER_HOST>" or the path to a Wappalyzer CLI. Backends that keep failing are taken out of rotation.', 
+        type=lambda value: [ spec.strip() for spec in value.split(',') if spec.strip() ])
+    parser.add_argument('--hedge', 
+        metavar="Percent", 
+        help='When an analysis runs longer than the p95 latency, start a second attempt (on another backend if possible) and keep the first to finish. At most this percentage of extra analyses are started. With python-Wappalyzer and the threads engine, the losing download is not interrupted and keeps its thread: at most one hedge or losing download per worker runs at a time. Disabled by default.', 
+        default=0, type=float)
     parser.add_argument('-p', '--python', 
         action='store_true', 
         help='Use full Python Wappalyzer implementation "python-Wappalyzer" even if Wappalyzer CLI is installed with NPM or docker.',
         required=False)
-    return(parser.parse_args())
+    parser.add_argument('--persistent', 
+        action='store_true', 
+        help='Keep one long-lived Wappalyzer driver process per worker and send it URLs over stdin/stdout instead of running the Wappalyzer CLI once per URL. Not applicable if using "python-Wappalyzer".',
+        required=False)
+    parser.add_argument('--warm_containers', 
+        action='store_true', 
+        help='When Wappalyzer CLI runs with docker, start one long-lived container per worker when the scan begins and run the CLI in them with "docker exec" instead of "docker run --rm" for each URL.',
+        required=False)
+    parser.add_argument('--recycle_pages', 
+        metavar="Number", 
+        help='Relaunch the headless browser of a Wappalyzer driver session (--persistent or --batch_size) after this many pages, 0 to disable.', 
+        default=100, type=int)
+    parser.add_argument('--recycle_rss', 
+        metavar="MB", 
+        help='Relaunch the headless browser of a Wappalyzer driver session (--persistent or --batch_size) when its processes use more memory than this, 0 to disable.', 
+        default=1024, type=int)
+    parser.add_argument('-t', '--timeout', 
+        metavar="Seconds", 
+        help='Longest time a wappalyzer/cli run or a python-Wappalyzer download can take. python-Wappalyzer starts with 10 seconds connect and first byte timeouts, raised up to this one by --adaptive_timeouts and --retry_timeouts.', 
+        default=1000, type=int)
+    parser.add_argument('--adaptive_timeouts', 
+        action='store_true', 
+        help='Learn the timeouts from the observed latencies: p99 x 3, between a floor and the longest timeout. Separate connect, first byte and total timeouts are learned when the backend exposes them.',
+        required=False)
+    parser.add_argument('--retry_timeouts', 
+        action='store_true', 
+        help='Analyze the timed out URLs once more at the end of the scan, with the longest timeouts.',
+        required=False)
+    parser.add_argument('--max_output', 
+        metavar="Bytes", 
+        help='Maximum number of bytes captured from the stdout and stderr of each wappalyzer/cli run, runs that write more are killed and recorded as resource failures.', 
+        default=10485760, type=int)
+    parser.add_argument('--memory_limit', 
+        metavar="MB", 
+        help='Limit the memory of each wappalyzer/cli child process (RLIMIT_DATA, or --memory with docker), runs that hit the limit are recorded as resource failures. Unlimited by default.', 
+        type=int)
+    parser.add_argument('--cache_dir', 
+        metavar="Directory", 
+        help='Directory of the cached fingerprint database used by python-Wappalyzer. Default: ~/.cache/masswappalyzer')
+    parser.add_argument('--fingerprints_url', 
+        metavar="URL", 
+        help='URL or path of the Wappalyzer technologies.json database used by python-Wappalyzer.', 
+        default=FingerprintDB.URL)
+    parser.add_argument('--fingerprints_ttl', 
+        metavar="Hours", 
+        help='Download the fingerprint database again when the cached one is older than this.', 
+        default=24, type=float)
+    parser.add_argument('--offline', 
+        action='store_true', 
+        help='Never download the fingerprint database, use the cached one whatever its age or the one bundled with python-Wappalyzer.',
+        required=False)
+    parser.add_argument('--regex_engine', 
+        metavar="Engine", 
+        help="Indicate how python-Wappalyzer matches the fingerprints. Choices: 're' (Python's re module), 're2' (google-re2 package), 'hyperscan' (hyperscan package). RE2 and Hyperscan search all the patterns they support at once in linear time without holding the GIL, the others are matched with re.", 
+        default='re', 
+        choices=list(REGEX_ENGINES))
+    parser.add_argument('--pool_hosts', 
+        metavar="Number", 
+        help='Number of hosts python-Wappalyzer keeps alive connections to.', 
+        default=100, type=int)
+    parser.add_argument('--pool_size', 
+        metavar="Number", 
+        help='Maximum number of alive connections python-Wappalyzer keeps per host. Default: the number of workers.', 
+        default=0, type=int)
+    parser.add_argument('--max_body', 
+        metavar="Bytes", 
+        help='Maximum number of bytes of a page downloaded by python-Wappalyzer, longer pages are truncated, analyzed on what was received and flagged in the output. 0 to disable.', 
+        default=10485760, type=int)
+    parser.add_argument('--max_read_time', 
+        metavar="Seconds", 
+        help='Longest time python-Wappalyzer spends downloading a page, slower pages are truncated, analyzed on what was received and flagged in the output. 0 to disable.', 
+        default=30, type=float)
+    parser.add_argument('--stream_idle', 
+        metavar="Bytes", 
+        help='Stop downloading a page with python-Wappalyzer when none of the fingerprint literals appeared in the last Bytes of the body, the page is analyzed on what was received and flagged in the output. A heuristic: fingerprints further down are missed. Disabled by default.', 
+        default=0, type=int)
+    parser.add_argument('--processes', 
+        metavar="Number", 
+        help="Parse and match the pages downloaded by python-Wappalyzer in this many processes, to use more than one CPU core. Use with at least as many workers (or --analyze_workers with the 'pipeline' engine). Disabled by default.", 
+        default=0, type=int)
+    parser.add_argument('--only_tech', 
+        metavar="Names", 
+        help='Comma separated list of the technologies to report, ex: "WordPress,Nginx". python-Wappalyzer only matches their fingerprints and the ones of the technologies that imply them.', 
+        type=lambda value: [ name.strip() for name in value.split(',') if name.strip() ])
+    parser.add_argument('--only_category', 
+        metavar="Names", 
+        help='Comma separated list of the categories of the technologies to report, ex: "CMS,Web servers". Combined with --only_tech.', 
+        type=lambda value: [ name.strip() for name in value.split(',') if name.strip() ])
+    parser.add_argument('--update_fingerprints', 
+        action='store_true', 
+        help='Download the fingerprint database into the cache and exit.',
+        required=False)
+    args = parser.parse_args()
+    if not args.inputfile and not args.update_fingerprints:
+        parser.error("the following arguments are required: -i/--inputfile")
+    return args
 
 def main():
 
     args = vars(parse_arguments())
 
+    if args.pop('update_fingerprints'):
+        fingerprints = FingerprintDB(cache_dir=args['cache_dir'], url=args['fingerprints_url'])
+        try:
+            digest = fingerprints.refresh()
+        except Exception as e:
+            print(f"Could not update the fingerprint database from {fingerprints.url}: {e}")
+            exit(1)
+        print(f"Fingerprint database {digest} saved in {fingerprints.cache_dir}")
+        exit(0)
+
     urls = file_to_list(args.pop('inputfile'))
 
     mass_w = MassWappalyzer(urls, **args)
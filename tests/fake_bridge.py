@@ -0,0 +1,37 @@
+"""
+Stand-in for the Node bridge (NODE_BRIDGE_JS) speaking the same JSON lines protocol, used by the tests of the CLI backends.
+
+Each reply reports the technology "Pid" with the process id as version, so the tests can tell the sessions apart.
+The URL selects the behaviour: "hang" never answers, "crash" exits, "error" replies an error, "malformed" replies without technologies.
+The environment variables FAKE_BRIDGE_HANG_AT_START and FAKE_BRIDGE_FAIL_ONCE (a file path) make the start hang or fail once.
+Arguments: the driver module path and the driver options (ignored), the bridge options; the options are echoed in the "ready" message.
+"""
+import json
+import os
+import sys
+import time
+
+def write(message:dict) -> None:
+    print(json.dumps(message), flush=True)
+
+if os.environ.get('FAKE_BRIDGE_HANG_AT_START'):
+    time.sleep(3600)
+# Fails to start once: the first session creates the file and exits
+if os.environ.get('FAKE_BRIDGE_FAIL_ONCE') and not os.path.exists(os.environ['FAKE_BRIDGE_FAIL_ONCE']):
+    open(os.environ['FAKE_BRIDGE_FAIL_ONCE'], 'w').close()
+    sys.exit(1)
+write({'ready': True, 'args': sys.argv[1:]})
+for line in sys.stdin:
+    request = json.loads(line)
+    url = request['url']
+    if 'hang' in url:
+        time.sleep(3600)
+    if 'crash' in url:
+        sys.exit(3)
+    if 'error' in url:
+        write({'id': request['id'], 'url': url, 'error': 'page error'})
+    elif 'malformed' in url:
+        write({'id': request['id'], 'url': url})
+    else:
+        write({'id': request['id'], 'url': url,
+            'technologies': [{'name': 'Pid', 'version': str(os.getpid()), 'categories': [{'name': 'Test'}]}]})
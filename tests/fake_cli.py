@@ -0,0 +1,31 @@
+"""
+Stand-in for the Wappalyzer CLI, used by the tests of the CLI backends: prints the technologies of the URL as JSON.
+
+The URL selects the behaviour: "hang" never exits, "big" writes 1 MB, "fail" exits with code 1, "oom" allocates 1 GB,
+"many" adds a technology of another category.
+"""
+import json
+import os
+import sys
+import time
+
+url = sys.argv[1]
+if 'hang' in url:
+    time.sleep(3600)
+if 'big' in url:
+    sys.stdout.write('x' * 1048576)
+    sys.exit(0)
+if 'oom' in url:
+    try:
+        memory = bytearray(1073741824)
+    except MemoryError:
+        # Like Node
+        print('FATAL ERROR: Reached heap limit Allocation failed - JavaScript heap out of memory', file=sys.stderr)
+        sys.exit(134)
+if 'fail' in url:
+    print('site down', file=sys.stderr)
+    sys.exit(1)
+technologies = [{'name': 'Pid', 'version': str(os.getpid()), 'categories': [{'name': 'Test'}]}]
+if 'many' in url:
+    technologies.append({'name': 'Nginx', 'version': '1.19.0', 'categories': [{'name': 'Web servers'}]})
+print(json.dumps({'urls': {url: {'status': 200}}, 'technologies': technologies}))
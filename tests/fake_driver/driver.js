@@ -0,0 +1,49 @@
+// Stand-in for the Wappalyzer driver module, loaded by NODE_BRIDGE_JS in the tests: no browser is launched.
+// Each analysis reports the browser it used (one per launch), the incognito context of its page and the driver options.
+let launches = 0
+
+class Browser {
+  constructor () {
+    this.id = ++launches
+    this.contexts = 0
+  }
+
+  async createIncognitoBrowserContext () {
+    const id = ++this.contexts
+    return { newPage: async () => ({ context: id }), close: async () => {} }
+  }
+
+  async newPage () {
+    return { context: 0 }
+  }
+}
+
+class Wappalyzer {
+  constructor (options) {
+    this.options = options
+  }
+
+  async init () {
+    this.browser = new Browser()
+  }
+
+  async destroy () {
+    this.browser = null
+  }
+
+  async open (url) {
+    return {
+      analyze: async () => {
+        if (url.includes('error')) throw new Error('page error')
+        const page = await this.browser.newPage()
+        const technology = (name, version) => ({ name, version: String(version), categories: [{ name: 'Test' }] })
+        return {
+          technologies: [technology('Browser', this.browser.id), technology('Context', page.context),
+            technology('Options', JSON.stringify(this.options))]
+        }
+      }
+    }
+  }
+}
+
+module.exports = Wappalyzer
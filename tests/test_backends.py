@@ -0,0 +1,195 @@
+"""
+Tests of the analyzers combining other analyzers: BackendPool and HedgedWappalyzer, with stand-in analyzers.
+Run with: python -m unittest discover tests
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+import unittest
+
+import masswappalyzer as m
+
+class Stub(m.IWappalyzer):
+    """
+    Analyzer taking `latency` seconds per host, failing with `error` if set. 
+    """
+    def __init__(self, name:str, latency:float=0, error:type=None) -> None:
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.hosts = []
+
+    def analyze(self, host):
+        self.hosts.append(host)
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error(f"{self.name} failed")
+        return [ m.Technology(host, self.name) ]
+
+def scan(wappalyzer, hosts, workers=5) -> list:
+    def analyze(host):
+        try:
+            return wappalyzer.analyze(host)
+        except m.AnalysisError as e:
+            return e
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(analyze, hosts))
+
+class TestBackendPool(unittest.TestCase):
+
+    def test_weighted_by_latency(self):
+        fast, slow = Stub('fast', 0.002), Stub('slow', 0.02)
+        scan(m.BackendPool([ ('fast', fast), ('slow', slow) ]), range(200))
+        self.assertGreater(len(fast.hosts), 3 * len(slow.hosts))
+
+    def test_failing_backend_gets_few_hosts(self):
+        # Fails fast with errors that could be the hosts' fault
+        broken, good = Stub('broken', error=m.AnalysisError), Stub('good', 0.005)
+        pool = m.BackendPool([ ('broken', broken), ('good', good) ])
+        results = scan(pool, range(200))
+        # max_streak, and the analyses in flight
+        self.assertLessEqual(len(broken.hosts), 20 + 5)
+        self.assertGreater(pool.backends[0].disabled_until, time.monotonic())
+        self.assertGreater(sum(not isinstance(r, m.AnalysisError) for r in results), 160)
+
+    def test_unmeasured_probes(self):
+        measured, new = Stub('measured'), Stub('new')
+        pool = m.BackendPool([ ('measured', measured), ('new', new) ], probes=2)
+        pool._release(pool._acquire(), 1.0)
+        backends = [ pool._acquire().name for _ in range(4) ]
+        self.assertEqual(backends, [ 'new', 'new', 'measured', 'measured' ])
+
+    def test_faulty_backend_out_of_rotation(self):
+        broken, good = Stub('broken', error=m.BackendError), Stub('good', 0.005)
+        pool = m.BackendPool([ ('broken', broken), ('good', good) ], max_failures=3)
+        results = scan(pool, range(50), workers=1)
+        self.assertEqual(len(broken.hosts), 3)
+        self.assertGreater(pool.backends[0].disabled_until, time.monotonic())
+        self.assertEqual(sum(isinstance(r, m.AnalysisError) for r in results), 3)
+
+    def test_host_failures(self):
+        # A few failing hosts in a row don't count
+        pool = m.BackendPool([ ('a', Stub('a', error=m.AnalysisTimeout)), ('b', Stub('b')) ], max_failures=3)
+        scan(pool, range(10), workers=1)
+        self.assertEqual(pool.backends[0].disabled_until, 0)
+        # The last backend in rotation is kept
+        a, b = Stub('a', error=m.AnalysisTimeout), Stub('b', error=m.AnalysisTimeout)
+        pool = m.BackendPool([ ('a', a), ('b', b) ], max_streak=5)
+        results = scan(pool, range(50), workers=1)
+        self.assertEqual(sorted(backend.disabled_until > 0 for backend in pool.backends), [ False, True ])
+        self.assertTrue(all(isinstance(r, m.AnalysisTimeout) for r in results))
+
+    def test_analyze_many(self):
+        pool = m.BackendPool([ ('a', Stub('a')), ('b', Stub('b', error=m.AnalysisError)) ])
+        for _ in range(4):
+            pool.analyze_many([ 'x', 'y' ])
+        a, b = pool.backends
+        self.assertEqual(a.success, 1)
+        self.assertLess(b.success, 1)
+
+class Slow(m.IWappalyzer):
+    """
+    Analyzer taking the next of `latencies` seconds for each call (0 when none is left), 
+    stopped when its attempt is cancelled unless `stubborn`, like a python-Wappalyzer download. 
+    """
+    def __init__(self, latencies:list, stubborn:bool=False) -> None:
+        self.latencies = latencies
+        self.stubborn = stubborn
+        self.calls = 0
+        self.cancelled_in = []
+        self.attempts = []
+
+    def _latency(self) -> float:
+        self.calls += 1
+        return self.latencies.pop(0) if self.latencies else 0
+
+    def analyze(self, host):
+        latency = self._latency()
+        stop = threading.Event()
+        attempt = m.Attempt.current()
+        if not self.stubborn:
+            attempt.add(stop, stop.set)
+        stop.wait(latency)
+        return [ m.Technology(host, 'Slow' if latency else 'Fast') ]
+
+    async def analyze_async(self, host):
+        latency = self._latency()
+        def kill():
+            # Like docker rm -f
+            time.sleep(0.3)
+            self.cancelled_in.append(threading.current_thread())
+        attempt = m.Attempt.current()
+        self.attempts.append(attempt)
+        attempt.add('kill', kill)
+        await asyncio.sleep(latency)
+        attempt.discard('kill')
+        return [ m.Technology(host, 'Slow' if latency else 'Fast') ]
+
+class TestHedgedWappalyzer(unittest.TestCase):
+
+    def hedged(self, wappalyzer, **options) -> m.HedgedWappalyzer:
+        hedged = m.HedgedWappalyzer(wappalyzer, ratio=0.5, min_samples=5, **options)
+        self.addCleanup(hedged.close)
+        for _ in range(100):
+            hedged.latencies.add(0.01)
+        return hedged
+
+    def test_hedge_wins(self):
+        slow = Slow([ 1 ])
+        hedged = self.hedged(slow)
+        began = time.monotonic()
+        self.assertEqual(hedged.analyze('slow')[0].name, 'Fast')
+        self.assertLess(time.monotonic() - began, 0.5)
+        self.assertEqual((hedged.hedges, slow.calls), (1, 2))
+
+    def test_no_hedge_below_quantile(self):
+        hedged = self.hedged(Slow([]))
+        hedged.analyze('fast')
+        self.assertEqual(hedged.hedges, 0)
+
+    def test_losers_count_against_the_threads(self):
+        hedged = self.hedged(Slow([ 1, 0, 1, 1, 0 ], stubborn=True), workers=1)
+        self.assertEqual(hedged.analyze('slow')[0].name, 'Fast')
+        # The loser still runs: no thread for another hedge
+        self.assertEqual(hedged.analyze('slow')[0].name, 'Slow')
+        self.assertEqual(hedged.hedges, 1)
+        self.assertEqual(hedged.analyze('slow')[0].name, 'Fast')
+        self.assertEqual(hedged.hedges, 2)
+
+    def test_async_cancel_off_the_loop(self):
+        slow = Slow([ 1 ])
+        hedged = self.hedged(slow)
+        async def main():
+            loop_thread = threading.current_thread()
+            began = time.monotonic()
+            techs = await hedged.analyze_async('slow')
+            # The loop is not blocked by the cancellation of the loser
+            await asyncio.sleep(0.1)
+            self.assertLess(time.monotonic() - began, 0.3)
+            await asyncio.sleep(0.5)
+            self.assertEqual(len(slow.cancelled_in), 1)
+            self.assertIsNot(slow.cancelled_in[0], loop_thread)
+            return techs
+        self.assertEqual(asyncio.run(main())[0].name, 'Fast')
+
+    def test_async_cancelled_during_the_hedge_delay(self):
+        slow = Slow([ 5 ])
+        hedged = self.hedged(slow)
+        for _ in range(100):
+            hedged.latencies.add(2)
+        async def main():
+            task = asyncio.ensure_future(hedged.analyze_async('slow'))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.5)
+        asyncio.run(main())
+        # No hedge was started, the primary attempt was cancelled
+        self.assertEqual((hedged.hedges, slow.calls), (0, 1))
+        self.assertTrue(slow.attempts[0].cancelled)
+        self.assertEqual(len(slow.cancelled_in), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Tests of the concurrency helpers of masswappalyzer: the adaptive batches and the engines driving the workers.
+Run with: python -m unittest discover tests
+"""
+import os
+import signal
+import threading
+import time
+import unittest
+
+import masswappalyzer as m
+
+class TestAdaptiveBatcher(unittest.TestCase):
+
+    def test_chunks(self):
+        batcher = m.AdaptiveBatcher(list(range(10)), initial=4)
+        self.assertEqual(batcher.next_batch(), (0, [0, 1, 2, 3]))
+        self.assertEqual(batcher.next_batch(), (4, [4, 5, 6, 7]))
+        self.assertEqual(batcher.next_batch(), (8, [8, 9]))
+        self.assertEqual(batcher.next_batch()[1], [])
+
+    def test_size_adapts(self):
+        batcher = m.AdaptiveBatcher([], initial=4, maximum=64, target=10)
+        # Fast chunks: grow at most twice at a time, up to the maximum
+        batcher.record(4, 0.1)
+        self.assertEqual(batcher.size, 8)
+        for _ in range(10):
+            batcher.record(batcher.size, 0.1)
+        self.assertEqual(batcher.size, 64)
+        # Slow chunk: about `target` seconds per chunk
+        batcher.record(64, 320)
+        self.assertEqual(batcher.size, 2)
+        batcher.record(2, 1000)
+        self.assertEqual(batcher.size, 1)
+
+class TestBatchDo(unittest.TestCase):
+
+    def test_results_in_order(self):
+        batcher = m.AdaptiveBatcher(list(range(100)), initial=3)
+        self.assertEqual(m.batch_do(lambda items: [ i * 2 for i in items ], batcher, workers=4), 
+            [ i * 2 for i in range(100) ])
+
+    @unittest.skipIf(os.name == "nt", "SIGINT can't be sent to the process itself")
+    def test_interrupted(self):
+        done = []
+        def slow(items):
+            time.sleep(0.2)
+            done.extend(items)
+            return items
+        batcher = m.AdaptiveBatcher(list(range(200)), initial=1, maximum=1)
+        # Like Ctrl-C
+        timer = threading.Timer(0.3, os.kill, (os.getpid(), signal.SIGINT))
+        timer.start()
+        began = time.monotonic()
+        with self.assertRaises(KeyboardInterrupt):
+            m.batch_do(slow, batcher, workers=2)
+        self.assertLess(time.monotonic() - began, 1)
+        time.sleep(0.5)
+        # The workers stopped after their current chunk
+        self.assertLess(len(done), 10)
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_concurrent_calls_batched(self):
+        batches = []
+        def double(items):
+            batches.append(len(items))
+            time.sleep(0.01)
+            return [ i * 2 for i in items ]
+        batcher = m.MicroBatcher(double, maximum=8)
+        self.assertEqual(batcher(1), 2)
+        self.assertEqual(batches, [1])
+        self.assertEqual(m.async_do(batcher, list(range(200)), asynch=True, workers=20), [ i * 2 for i in range(200) ])
+        self.assertLessEqual(max(batches), 8)
+        self.assertEqual(sum(batches), 201)
+        # The workers downloading while a batch runs are analyzed together
+        self.assertLess(len(batches), 100)
+
+    def test_concurrency(self):
+        running, seen = [], []
+        def slow(items):
+            running.append(1)
+            seen.append(len(running))
+            time.sleep(0.01)
+            running.pop()
+            return items
+        m.async_do(m.MicroBatcher(slow, maximum=4, concurrency=2), list(range(100)), asynch=True, workers=10)
+        self.assertEqual(max(seen), 2)
+
+    def test_error(self):
+        def fail(items):
+            time.sleep(0.01)
+            raise ValueError(items)
+        batcher = m.MicroBatcher(fail, maximum=8)
+        errors = []
+        def call(item):
+            try:
+                batcher(item)
+            except ValueError as e:
+                errors.append(item in e.args[0])
+        m.async_do(call, list(range(20)), asynch=True, workers=5)
+        # Each caller gets the error of its batch
+        self.assertEqual(errors, [ True ] * 20)
+
+class TestPipelineDo(unittest.TestCase):
+
+    def test_results_in_order(self):
+        batches = []
+        def consume(items, produced):
+            batches.append(len(items))
+            return [ (item, p) for item, p in zip(items, produced) ]
+        stats = m.PipelineStats(8)
+        results = m.pipeline_do(lambda item: item * 2, consume, list(range(100)), producers=4, consumers=2, size=8, batch=5, 
+            stats=stats)
+        self.assertEqual(results, [ (i, i * 2) for i in range(100) ])
+        self.assertLessEqual(max(batches), 5)
+        self.assertEqual(sum(batches), 100)
+
+    def test_bounded_queue(self):
+        produced = []
+        def produce(item):
+            produced.append(item)
+            return item
+        def consume(items, pages):
+            # Slower than the producers
+            time.sleep(0.01)
+            # At most the queue, the batch taken and one item per producer waiting to be queued
+            self.assertLessEqual(len(produced) - len(done), 4 + 1 + 2)
+            done.extend(items)
+            return items
+        done = []
+        m.pipeline_do(produce, consume, list(range(50)), producers=2, consumers=1, size=4)
+
+    def test_error_stops_the_run(self):
+        def produce(item):
+            if item == 10:
+                raise ValueError(item)
+            time.sleep(0.01)
+            return item
+        consumed = []
+        with self.assertRaises(ValueError):
+            m.pipeline_do(produce, lambda items, produced: consumed.extend(items) or items, list(range(1000)), 
+                producers=2, consumers=1, size=4)
+        self.assertLess(len(consumed), 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests of the on-disk cache of the fingerprint database and of its compiled index.
+Run with: python -m unittest discover tests
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import masswappalyzer as m
+
+try:
+    import Wappalyzer
+except ImportError:
+    Wappalyzer = None
+
+def database(version:str) -> bytes:
+    return json.dumps({'categories': {'22': {'name': 'Web servers'}}, 'technologies': {
+        'Nginx': {'cats': [22], 'headers': {'Server': 'nginx(?:/([\\d.]+))?\;version:\\1'}, 'website': version}}}).encode()
+
+class TestFingerprintDB(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        # The databases are "downloaded" from a local file
+        self.source = os.path.join(self.dir, 'technologies.json')
+        self.publish('1')
+
+    def publish(self, version:str) -> str:
+        with open(self.source, 'wb') as f:
+            f.write(database(version))
+        return hashlib.sha256(database(version)).hexdigest()
+
+    def db(self, **options) -> m.FingerprintDB:
+        return m.FingerprintDB(cache_dir=os.path.join(self.dir, 'cache'), url=self.source, **options)
+
+    def index(self, db:m.FingerprintDB) -> str:
+        with contextlib.redirect_stdout(io.StringIO()):
+            index, digest = db.index()
+        self.assertIn('Nginx', index.technologies)
+        return digest
+
+    def expire(self, db:m.FingerprintDB, hours:float) -> None:
+        past = time.time() - hours * 3600
+        os.utime(os.path.join(db.cache_dir, 'current'), (past, past))
+
+    def test_download_once_per_ttl(self):
+        first = self.publish('1')
+        db = self.db(ttl=24)
+        self.assertEqual(self.index(db), first)
+        second = self.publish('2')
+        self.assertEqual(self.index(db), first)
+        self.expire(db, 25)
+        self.assertEqual(self.index(db), second)
+
+    def test_offline(self):
+        first = self.publish('1')
+        self.index(self.db())
+        self.publish('2')
+        db = self.db(offline=True)
+        self.expire(db, 1000)
+        self.assertEqual(self.index(db), first)
+
+    def test_failed_update_keeps_the_cache(self):
+        first = self.publish('1')
+        db = self.db()
+        self.index(db)
+        self.expire(db, 25)
+        with open(self.source, 'w') as f:
+            f.write('{"not": "a database"}')
+        self.assertEqual(self.index(db), first)
+
+    def test_database_not_hashed_at_start(self):
+        db = self.db()
+        digest = self.index(db)
+        with open(db.path(digest), 'ab') as f:
+            f.write(b' ')
+        # The index of the database is used
+        self.assertEqual(self.index(db), digest)
+
+    def test_corrupted_cache(self):
+        first = self.publish('1')
+        db = self.db()
+        self.index(db)
+        with open(db.path(first), 'ab') as f:
+            f.write(b' ')
+        for name in os.listdir(db.cache_dir):
+            if name.endswith('.pickle'):
+                os.remove(os.path.join(db.cache_dir, name))
+        second = self.publish('2')
+        self.assertEqual(self.index(db), second)
+
+    def test_index_saved(self):
+        db = self.db()
+        digest = self.index(db)
+        pickles = [ name for name in os.listdir(db.cache_dir) if name.endswith('.pickle') ]
+        self.assertEqual(pickles, [ f'{digest}.index-{m.FingerprintIndex.FORMAT}.pickle' ])
+        # The database is not read when its index is loaded
+        os.remove(db.path(digest))
+        self.publish('2')
+        self.assertEqual(self.index(self.db(offline=True)), digest)
+
+    @unittest.skipIf(Wappalyzer is None, "python-Wappalyzer is not installed")
+    def test_bundled(self):
+        db = m.FingerprintDB(cache_dir=os.path.join(self.dir, 'empty'), offline=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            digest, data = db._select()
+        self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+        self.assertIn('technologies', json.loads(data))
+
+if __name__ == '__main__':
+    unittest.main()
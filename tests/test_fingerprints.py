@@ -0,0 +1,264 @@
+"""
+Differential tests of the python-Wappalyzer matcher of masswappalyzer (FingerprintIndex, the RE2 and Hyperscan engines,
+the implies closure) against python-Wappalyzer itself, on the fingerprint database it bundles.
+
+The pages are generated from the fingerprints: each one holds values built from the patterns of a random sample of technologies.
+The restrictions of the index to allow-lists (--only_tech, --only_category) are tested on a small database.
+Run with: python -m unittest discover tests
+"""
+import contextlib
+import copy
+import io
+import json
+import pkgutil
+import random
+import types
+import unittest
+import warnings
+from typing import Optional
+
+import masswappalyzer as m
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    import sre_constants, sre_parse
+try:
+    import Wappalyzer
+    import requests
+except ImportError:
+    Wappalyzer = None
+
+PAGES = 150
+
+BOILERPLATE = ('<!DOCTYPE html><html><head><title>Example</title><link rel="stylesheet" href="/style.css"></head>'
+    '<body><div class="main"><p>Lorem ipsum dolor sit amet.</p><a href="/about">About</a></div></body></html>')
+
+def sample(pattern:str, rnd:random.Random) -> str:
+    """
+    Return a text matched by the pattern, most of the time: lookarounds and back references are ignored.
+    """
+    try:
+        return _sample(sre_parse.parse(pattern.split('\\;')[0]), rnd)
+    except Exception:
+        return ''
+
+def _sample(parsed, rnd:random.Random) -> str:
+    out = []
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            out.append(chr(av))
+        elif op is sre_constants.NOT_LITERAL:
+            out.append('b' if av == ord('a') else 'a')
+        elif op is sre_constants.ANY:
+            out.append('x')
+        elif op is sre_constants.IN:
+            char = 'q' if any(o is sre_constants.NEGATE for o, _ in av) else '1'
+            for o, a in av:
+                if o is sre_constants.NEGATE:
+                    break
+                if o is sre_constants.LITERAL:
+                    char = chr(a)
+                    break
+                if o is sre_constants.RANGE:
+                    char = chr(rnd.randint(a[0], min(a[1], a[0] + 9)))
+                    break
+            out.append(char)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, sub = av
+            count = low or rnd.choice([0, 1, 1, 2])
+            if high != sre_constants.MAXREPEAT:
+                count = min(count, high)
+            out.extend(_sample(sub, rnd) for _ in range(count))
+        elif op is sre_constants.SUBPATTERN:
+            out.append(_sample(av[-1], rnd))
+        elif op is sre_constants.BRANCH:
+            out.append(_sample(rnd.choice(av[1]), rnd))
+        elif op is sre_constants.CATEGORY:
+            out.append({sre_constants.CATEGORY_DIGIT: '3', sre_constants.CATEGORY_SPACE: ' '}.get(av, 'w'))
+    return ''.join(out)
+
+def _list(value) -> list:
+    return [] if value is None else value if isinstance(value, list) else [value]
+
+def generate_pages(technologies:dict, count:int, seed:int=0) -> list:
+    """
+    Return python-Wappalyzer `WebPage`s with the values of random technologies.
+    """
+    rnd = random.Random(seed)
+    techs = sorted(technologies.items())
+    pages = []
+    for i in range(count):
+        url = f'http://site{i}.example/'
+        headers, scripts, meta = {}, [], {}
+        html = BOILERPLATE
+        for _, tech in rnd.sample(techs, rnd.randint(0, 25)):
+            for name, pattern in (tech.get('headers') or {}).items():
+                headers[name] = sample(pattern, rnd)
+            for pattern in _list(tech.get('scripts')):
+                scripts.append(sample(pattern, rnd))
+            tech_meta = tech.get('meta') or {}
+            if not isinstance(tech_meta, dict):
+                tech_meta = {'generator': tech_meta}
+            for name, pattern in tech_meta.items():
+                meta[name.lower()] = sample(pattern, rnd)
+            for pattern in _list(tech.get('html')):
+                html += sample(pattern, rnd)
+            for pattern in _list(tech.get('url')):
+                url = sample(pattern, rnd) or url
+        html = html.replace('</head>', ''.join(f'<script src="{s}"></script>' for s in scripts) +
+            ''.join(f'<meta name="{n}" content="{c}">' for n, c in meta.items()) + '</head>', 1)
+        pages.append(Wappalyzer.WebPage(url, html, requests.structures.CaseInsensitiveDict(headers)))
+    return pages
+
+@unittest.skipIf(Wappalyzer is None, "python-Wappalyzer is not installed")
+class TestFingerprintIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        warnings.simplefilter('ignore')
+        cls.db = json.loads(pkgutil.get_data('Wappalyzer', 'data/technologies.json'))
+        cls.pages = generate_pages(cls.db['technologies'], PAGES)
+        cls.expected = []
+        wappalyzer = cls.wappalyzer()
+        technologies = wappalyzer.technologies
+        for page in cls.pages:
+            # python-Wappalyzer keeps state in its technologies between pages
+            wappalyzer.technologies = copy.deepcopy(technologies)
+            try:
+                cls.expected.append(wappalyzer.analyze_with_versions_and_categories(page))
+            except KeyError:
+                # Implied technology missing from the database, python-Wappalyzer fails
+                cls.expected.append(None)
+
+    @classmethod
+    def wappalyzer(cls) -> 'Wappalyzer.Wappalyzer':
+        # python-Wappalyzer compiles the patterns in the database it is given
+        db = copy.deepcopy(cls.db)
+        return Wappalyzer.Wappalyzer(categories=db['categories'], technologies=db['technologies'])
+
+    def index(self, engine:str='re') -> m.FingerprintIndex:
+        index = m.FingerprintIndex.build(self.db)
+        index.engine = m.REGEX_ENGINES[engine]()
+        return index
+
+    def check_engine(self, engine:str) -> None:
+        index = self.index(engine)
+        compared = 0
+        for page, expected in zip(self.pages, self.expected):
+            if expected is not None:
+                self.assertEqual(index.analyze(page), expected, page.url)
+                compared += 1
+        self.assertGreater(compared, PAGES // 2)
+
+    def test_re(self):
+        self.check_engine('re')
+
+    @unittest.skipIf(m.re2 is None, "google-re2 is not installed")
+    def test_re2(self):
+        self.check_engine('re2')
+
+    @unittest.skipIf(m.hyperscan is None, "hyperscan is not installed")
+    def test_hyperscan(self):
+        self.check_engine('hyperscan')
+
+    def test_analyze_many(self):
+        index = self.index()
+        pages = [ page for page, expected in zip(self.pages, self.expected) if expected is not None ]
+        # Repeated pages share all their values
+        pages = pages + pages[:20]
+        results = []
+        for i in range(0, len(pages), 32):
+            results += index.analyze_many(pages[i:i + 32])
+        self.assertEqual(results, [ index.analyze(page) for page in pages ])
+
+    def test_fold(self):
+        page = Wappalyzer.WebPage('http://site.example/',
+            '<html><head><meta name="generator" content="WİX.com Website Builder"></head></html>', {})
+        expected = self.wappalyzer().analyze_with_versions_and_categories(page)
+        self.assertIn('Wix', expected)
+        self.assertEqual(self.index().analyze(page), expected)
+
+    def test_implied(self):
+        index = self.index()
+        def implied(detected):
+            found = set()
+            todo = list(detected)
+            while todo:
+                tech = index.technologies.get(todo.pop())
+                for name in tech['implies'] if tech else ():
+                    if name not in found:
+                        found.add(name)
+                        todo.append(name)
+            return found
+        rnd = random.Random(0)
+        names = sorted(index.technologies) + ['Unknown technology']
+        for _ in range(2000):
+            detected = set(rnd.sample(names, rnd.randint(0, 12)))
+            self.assertEqual(index.implied(detected), implied(detected))
+
+DATABASE = {'categories': {'1': {'name': 'CMS'}, '22': {'name': 'Web servers'}, '27': {'name': 'Programming languages'}, 
+    '59': {'name': 'JavaScript libraries'}}, 'technologies': {
+    'Nginx': {'cats': [22], 'headers': {'Server': 'nginx(?:/([\\d.]+))?\\;version:\\1'}}, 
+    'PHP': {'cats': [27], 'headers': {'X-Powered-By': '^php/?([\\d.]+)?\\;version:\\1'}}, 
+    'WordPress': {'cats': [1], 'html': ['<link rel=["\']stylesheet["\'] [^>]+wp-content'], 
+        'meta': {'generator': '^WordPress ?([\\d.]+)?\\;version:\\1'}, 'implies': 'PHP'}, 
+    'jQuery': {'cats': [59], 'scripts': ['jquery[.-]([\\d.]*\\d)[^/]*\\.js\\;version:\\1']}}}
+
+def page(url:str='http://site.example/', html:str='', headers:Optional[dict]=None, scripts:Optional[list]=None, 
+         meta:Optional[dict]=None) -> types.SimpleNamespace:
+    """
+    Page with the fields of python-Wappalyzer's WebPage, header names are lowercase. 
+    """
+    return types.SimpleNamespace(url=url, html=html, headers=headers or {}, scripts=scripts or [], meta=meta or {})
+
+class TestRestrict(unittest.TestCase):
+
+    def setUp(self):
+        self.index = m.FingerprintIndex.build(DATABASE)
+        self.page = page(headers={'server': 'nginx/1.19.0', 'x-powered-by': 'PHP/8.0.1'}, 
+            scripts=['/js/jquery-3.5.1.min.js'], meta={'generator': 'WordPress 5.8'})
+
+    def restrict(self, **options) -> m.FingerprintIndex:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.index.restrict(m.TechnologyFilter(**options))
+
+    def test_unrestricted(self):
+        self.assertEqual(set(self.index.analyze(self.page)), {'Nginx', 'PHP', 'WordPress', 'jQuery'})
+
+    def test_technologies(self):
+        index = self.restrict(techs=['NGINX', 'jquery'])
+        self.assertEqual(set(index.technologies), {'Nginx', 'jQuery'})
+        self.assertEqual(index.analyze(self.page), {'Nginx': {'versions': ['1.19.0'], 'categories': ['Web servers']}, 
+            'jQuery': {'versions': ['3.5.1'], 'categories': ['JavaScript libraries']}})
+
+    def test_categories(self):
+        index = self.restrict(categories=['cms', 'Web servers'])
+        self.assertEqual(set(index.analyze(self.page)), {'Nginx', 'WordPress'})
+
+    def test_implied_not_reported(self):
+        index = self.restrict(techs=['PHP'])
+        # WordPress implies PHP: it's matched, but not reported
+        self.assertEqual(set(index.technologies), {'PHP', 'WordPress'})
+        self.assertEqual(index.analyze(page(meta={'generator': 'WordPress 5.8'})), 
+            {'PHP': {'versions': [], 'categories': ['Programming languages']}})
+        self.assertEqual(index.analyze_many([ self.page, page(html='<p>Hello</p>') ]), 
+            [ {'PHP': {'versions': ['8.0.1'], 'categories': ['Programming languages']}}, {} ])
+
+    def test_headers_only(self):
+        # No url, html or scripts pattern left
+        index = self.restrict(techs=['Nginx'])
+        self.assertEqual(set(index.analyze(self.page)), {'Nginx'})
+        self.assertEqual(index.analyze(page(html='<p>Hello</p>')), {})
+        self.assertEqual(set(self.restrict(categories=['Programming languages']).analyze(self.page)), {'PHP'})
+
+    def test_unknown_names(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            index = self.index.restrict(m.TechnologyFilter(['Nginx', 'Nope'], ['Nothing']))
+        self.assertIn("Unknown technology: nope", out.getvalue())
+        self.assertIn("Unknown category: nothing", out.getvalue())
+        self.assertEqual(set(index.technologies), {'Nginx'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,364 @@
+"""
+Tests of the wappalyzer/cli backends, with stand-ins of the CLI and of the Node bridge: no Node, browser or docker needed.
+Run with: python -m unittest discover tests
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import masswappalyzer as m
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FAKE_BRIDGE = [ sys.executable, os.path.join(HERE, 'fake_bridge.py') ]
+FAKE_CLI = f"{sys.executable} {os.path.join(HERE, 'fake_cli.py')}"
+
+def pid(techs) -> str:
+    return techs[0].version
+
+class TestDriverOptions(unittest.TestCase):
+
+    def test_long_options(self):
+        self.assertEqual(m.cli_args_to_driver_options(['--probe', '--user-agent=Mozilla/5.0', '--max-urls', '3', '--pretty']),
+            {'probe': True, 'userAgent': 'Mozilla/5.0', 'maxUrls': 3})
+
+    def test_short_options(self):
+        self.assertEqual(m.cli_args_to_driver_options(['-r', '-D', '2', '-a', 'Bot', '-P']),
+            {'recursive': True, 'maxDepth': 2, 'userAgent': 'Bot'})
+
+    def test_booleans(self):
+        self.assertEqual(m.cli_args_to_driver_options(['--recursive=false', '--probe', 'true', '-N', 'no']),
+            {'recursive': False, 'probe': True, 'noRedirect': False})
+
+class TestJsWappalyzerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = m.JsWappalyzerPool(path=sys.executable, workers=1, timeout=5)
+        self.pool.bridgecmd = FAKE_BRIDGE
+        self.addCleanup(self.pool.close)
+
+    def test_worker_reused(self):
+        first = self.pool.analyze('http://a.example/')
+        self.assertEqual(first[0].name, 'Pid')
+        self.assertEqual(first[0].categories, ['Test'])
+        self.assertEqual(pid(self.pool.analyze('http://b.example/')), pid(first))
+
+    def test_error_reply(self):
+        with self.assertRaises(m.AnalysisError):
+            self.pool.analyze('http://error.example/')
+        # The worker is still usable
+        self.pool.analyze('http://a.example/')
+
+    def test_scan_over(self):
+        self.pool.analyze('http://a.example/')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.pool.reaper.sweep()
+        # Not an empty result: the host is recorded as failed
+        with self.assertRaises(m.BackendError):
+            self.pool.analyze('http://b.example/')
+
+    def test_dead_worker_replaced(self):
+        first = pid(self.pool.analyze('http://a.example/'))
+        with self.assertRaises(m.BackendError):
+            self.pool.analyze('http://crash.example/')
+        self.assertNotEqual(pid(self.pool.analyze('http://b.example/')), first)
+
+    def test_malformed_reply(self):
+        with self.assertRaises(m.AnalysisError):
+            self.pool.analyze('http://malformed.example/')
+
+class TestBatchSession(unittest.TestCase):
+
+    def setUp(self):
+        self.wappalyzer = m.JsWappalyzer(path=sys.executable, timeout=2)
+        self.addCleanup(self.wappalyzer.close)
+
+    def analyze(self, hosts, cmd=FAKE_BRIDGE) -> list:
+        return self.wappalyzer._analyze_batch(hosts, cmd)
+
+    def test_one_session(self):
+        results = self.analyze([ 'a.example', 'b.example', 'c.example' ])
+        self.assertEqual([ techs[0].url for techs in results ], [ 'a.example', 'b.example', 'c.example' ])
+        self.assertEqual(len({ pid(techs) for techs in results }), 1)
+
+    def test_timeout_fails_only_the_host(self):
+        a, hang, b = self.analyze([ 'a.example', 'hang.example', 'b.example' ])
+        self.assertIsInstance(hang, m.AnalysisTimeout)
+        # A new session analyzed the hosts left
+        self.assertNotEqual(pid(a), pid(b))
+
+    def test_crash_fails_only_the_host(self):
+        a, crash, b = self.analyze([ 'a.example', 'crash.example', 'b.example' ])
+        self.assertIsInstance(crash, m.BackendError)
+        self.assertEqual(b[0].name, 'Pid')
+
+    def test_malformed_reply(self):
+        a, malformed, b = self.analyze([ 'a.example', 'malformed.example', 'b.example' ])
+        self.assertIsInstance(malformed, m.AnalysisError)
+        self.assertEqual(pid(a), pid(b))
+
+    def test_start_failure_fails_all_hosts(self):
+        hosts = [ f'site{i}.example' for i in range(8) ]
+        for cmd in ([ 'env', 'FAKE_BRIDGE_HANG_AT_START=1' ] + FAKE_BRIDGE, [ os.path.join(HERE, 'missing') ]):
+            began = time.monotonic()
+            results = self.analyze(hosts, cmd)
+            self.assertTrue(all(isinstance(error, m.BackendError) for error in results), results)
+            # Two session starts only
+            self.assertLess(time.monotonic() - began, 6)
+
+    def test_scan_over_fails_the_hosts_left(self):
+        def sweep():
+            time.sleep(0.5)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.wappalyzer.reaper.sweep()
+        sweeper = threading.Thread(target=sweep)
+        sweeper.start()
+        a, hang, b, c = self.analyze([ 'a.example', 'hang.example', 'b.example', 'c.example' ])
+        sweeper.join()
+        self.assertEqual(a[0].name, 'Pid')
+        self.assertIsInstance(hang, m.BackendError)
+        # Not empty results: the hosts are recorded as failed
+        self.assertIsInstance(b, m.BackendError)
+        self.assertIsInstance(c, m.BackendError)
+
+    def test_start_failure_retried(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            flag = os.path.join(tmp, 'failed')
+            results = self.analyze([ 'a.example', 'b.example' ], [ 'env', f'FAKE_BRIDGE_FAIL_ONCE={flag}' ] + FAKE_BRIDGE)
+            self.assertTrue(os.path.exists(flag))
+        self.assertEqual([ techs[0].name for techs in results ], [ 'Pid', 'Pid' ])
+
+@unittest.skipIf(shutil.which('node') is None, "Node is not installed")
+class TestNodeBridge(unittest.TestCase):
+    """
+    The real bridge, running a stand-in of the driver module. 
+    """
+    def pool(self, **options) -> m.JsWappalyzerPool:
+        # The driver module is found next to the CLI script
+        pool = m.JsWappalyzerPool(path=os.path.join(HERE, 'fake_driver', 'cli.js'), workers=1, timeout=10, **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def analyze(self, pool, host) -> dict:
+        return { t.name: t.version for t in pool.analyze(host) }
+
+    def test_shared_browser(self):
+        pool = self.pool(args='--probe -a Bot --max-urls 3')
+        first, second = self.analyze(pool, 'a.example'), self.analyze(pool, 'b.example')
+        self.assertEqual(first['Browser'], second['Browser'])
+        # One incognito context per page
+        self.assertEqual((first['Context'], second['Context']), ('1', '2'))
+        self.assertEqual(json.loads(first['Options']), {'probe': True, 'userAgent': 'Bot', 'maxUrls': 3})
+
+    def test_recycle_pages(self):
+        pool = self.pool(recycle_pages=2, recycle_rss=0)
+        browsers = [ self.analyze(pool, f'site{i}.example')['Browser'] for i in range(5) ]
+        self.assertEqual(browsers, [ '1', '1', '2', '2', '3' ])
+
+    @unittest.skipUnless(os.path.isdir('/proc'), "the memory of the browser is read in /proc")
+    def test_recycle_rss(self):
+        # Any process uses more than 1 MB
+        pool = self.pool(recycle_pages=0, recycle_rss=1)
+        browsers = [ self.analyze(pool, f'site{i}.example')['Browser'] for i in range(3) ]
+        self.assertEqual(browsers, [ '1', '2', '3' ])
+
+    def test_page_error(self):
+        pool = self.pool()
+        with self.assertRaises(m.AnalysisError):
+            pool.analyze('error.example')
+        self.assertEqual(self.analyze(pool, 'a.example')['Context'], '2')
+
+def running(pid:int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Zombies are not running
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+@unittest.skipUnless(hasattr(os, 'killpg'), "process groups are POSIX only")
+class TestProcessReaper(unittest.TestCase):
+
+    def setUp(self):
+        self.reaper = m.ProcessReaper()
+        self.addCleanup(self.reaper.sweep)
+
+    def start_tree(self) -> subprocess.Popen:
+        # A child left running in the background, like a headless browser
+        proc = self.reaper.popen([ 'sh', '-c', 'sleep 60 & echo $!; wait' ], stdout=subprocess.PIPE)
+        self.addCleanup(proc.stdout.close)
+        return proc, int(proc.stdout.readline())
+
+    def test_kill_tree(self):
+        proc, child = self.start_tree()
+        self.reaper.kill(proc.pid)
+        proc.wait()
+        time.sleep(0.1)
+        self.assertFalse(running(child))
+
+    def test_sweep(self):
+        proc, child = self.start_tree()
+        self.reaper.sweep()
+        proc.wait()
+        time.sleep(0.1)
+        self.assertFalse(running(child))
+        with self.assertRaises(RuntimeError):
+            self.reaper.popen([ 'true' ])
+
+    def test_without_process_groups(self):
+        killpg = os.killpg
+        del os.killpg
+        try:
+            proc, child = self.start_tree()
+            self.reaper.kill(proc.pid)
+            self.assertIsNotNone(proc.wait(timeout=5))
+            # An exited process is not killed again, its pid could be reused
+            self.assertFalse(m.ProcessReaper._kill_group(proc.pid, exited=True))
+        finally:
+            os.killpg = killpg
+            os.kill(child, 9)
+
+class TestAsyncio(unittest.TestCase):
+
+    def setUp(self):
+        self.wappalyzer = m.JsWappalyzer(path=FAKE_CLI, timeout=2)
+        self.addCleanup(self.wappalyzer.close)
+
+    def test_analyze_async(self):
+        hosts = [ f'http://site{i}.example/' for i in range(6) ]
+        results = m.asyncio_do(self.wappalyzer.analyze_async, hosts, workers=3)
+        self.assertEqual([ techs[0].url for techs in results ], hosts)
+        self.assertEqual(len({ pid(techs) for techs in results }), len(hosts))
+
+    def test_timeout_does_not_block_the_loop(self):
+        async def main():
+            began = time.monotonic()
+            hung, ok = await asyncio.gather(self.wappalyzer.analyze_async('http://hang.example/'), 
+                self.wappalyzer.analyze_async('http://ok.example/'), return_exceptions=True)
+            self.assertIsInstance(hung, m.AnalysisTimeout)
+            self.assertEqual(ok[0].name, 'Pid')
+            self.assertLess(time.monotonic() - began, 4)
+        asyncio.run(main())
+
+    def test_failure(self):
+        with self.assertRaises(m.AnalysisError):
+            asyncio.run(self.wappalyzer.analyze_async('http://fail.example/'))
+
+class TestOnly(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def run_scan(self, **options) -> list:
+        with contextlib.redirect_stdout(io.StringIO()):
+            scan = m.MassWappalyzer([ 'http://many.example/', 'http://one.example/' ], os.path.join(self.dir, 'out'), 
+                outputformat='json', wappalyzerpath=FAKE_CLI, timeout=5, cache_dir=self.dir, **options)
+            scan.run()
+        with open(scan.outputfile) as f:
+            return json.load(f)
+
+    def test_category(self):
+        # The CLI reports all the technologies, the ones outside the categories are dropped
+        rows = self.run_scan(only_category=['web servers'])
+        self.assertEqual([ (row['Url'], row['Nginx']) for row in rows ], [ ('http://many.example/', 'Detected, version 1.19.0') ])
+        self.assertNotIn('Pid', rows[0])
+
+    def test_technology_and_category(self):
+        rows = self.run_scan(only_tech=['pid'], only_category=['Web servers'])
+        self.assertEqual([ row['Url'] for row in rows ], [ 'http://many.example/', 'http://one.example/' ])
+        self.assertEqual(set(rows[0]) - {'Url'}, {'Pid', 'Nginx'})
+
+class TestResourceLimits(unittest.TestCase):
+
+    def test_capped_reader(self):
+        overflows = []
+        read, write = os.pipe()
+        with open(read, 'rb') as pipe:
+            reader = m._CappedReader(pipe, 100, on_overflow=lambda: overflows.append(1))
+            with open(write, 'wb') as out:
+                out.write(b'x' * 80)
+                out.flush()
+                time.sleep(0.1)
+                out.write(b'x' * 1000)
+            reader.join(5)
+            # Closed at EOF
+            self.assertTrue(pipe.closed)
+        self.assertEqual((bytes(reader.data), reader.overflow, overflows), (b'x' * 80, True, [1]))
+
+    def test_max_output(self):
+        wappalyzer = m.JsWappalyzer(path=FAKE_CLI, timeout=5, max_output=1000)
+        self.addCleanup(wappalyzer.close)
+        with self.assertRaises(m.ResourceLimitExceeded):
+            wappalyzer.analyze('http://big.example/')
+        with self.assertRaises(m.ResourceLimitExceeded):
+            asyncio.run(wappalyzer.analyze_async('http://big.example/'))
+        self.assertEqual(wappalyzer.analyze('http://small.example/')[0].name, 'Pid')
+
+    @unittest.skipIf(m.resource is None, "resource limits are POSIX only")
+    def test_memory_limit(self):
+        wappalyzer = m.JsWappalyzer(path=FAKE_CLI, timeout=5, memory_limit=256)
+        self.addCleanup(wappalyzer.close)
+        with self.assertRaises(m.ResourceLimitExceeded):
+            wappalyzer.analyze('http://oom.example/')
+        self.assertEqual(wappalyzer.analyze('http://small.example/')[0].name, 'Pid')
+
+class TestDockerContainerPool(unittest.TestCase):
+
+    def setUp(self):
+        # The containers are not started, only the bookkeeping is tested
+        self.pool = object.__new__(m.DockerContainerPool)
+        self.pool.command = [ 'node', 'cli.js' ]
+        self.pool._idle = queue.Queue()
+        for name in ('c1', 'c2'):
+            self.pool._idle.put(name)
+
+    def test_container_released(self):
+        with self.pool.container() as first:
+            with self.pool.container() as second:
+                self.assertEqual({first, second}, {'c1', 'c2'})
+                self.assertEqual(self.pool._idle.qsize(), 0)
+        self.assertEqual(self.pool._idle.qsize(), 2)
+
+    def test_cancelled_acquire_gives_back_the_container(self):
+        async def main():
+            names = [ await self.pool.acquire_async(), await self.pool.acquire_async() ]
+            waiting = asyncio.ensure_future(self.pool.acquire_async())
+            await asyncio.sleep(0.1)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            self.pool.release(names[0])
+            await asyncio.sleep(0.1)
+            self.assertEqual(self.pool._idle.qsize(), 1)
+            self.assertEqual(await self.pool.acquire_async(), names[0])
+        asyncio.run(main())
+
+    def test_exec_command(self):
+        wappalyzer = m.JsWappalyzer(path='docker run --rm wappalyzer/cli', args='--probe')
+        wappalyzer.containers = self.pool
+        self.assertEqual(wappalyzer._command('example.com', 'c1'), 
+            [ 'docker', 'exec', 'c1', 'node', 'cli.js', 'http://example.com', '--probe' ])
+
+    def test_image_command(self):
+        # Like docker run, the arguments replace the cmd of the image
+        self.assertEqual(m.docker_image_command({'Entrypoint': [ 'node', 'cli.js' ], 'Cmd': [ '--help' ]}), [ 'node', 'cli.js' ])
+        self.assertEqual(m.docker_image_command({'Entrypoint': None, 'Cmd': [ 'node', 'cli.js' ]}), [ 'node', 'cli.js' ])
+        self.assertEqual(m.docker_image_command({}), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,312 @@
+"""
+Tests of the python-Wappalyzer backend of masswappalyzer, against a local HTTP server.
+Run with: python -m unittest discover tests
+"""
+import asyncio
+import concurrent.futures
+import http.server
+import tempfile
+import threading
+import time
+import warnings
+import unittest
+from typing import Tuple
+
+import masswappalyzer as m
+
+try:
+    import Wappalyzer
+except ImportError:
+    Wappalyzer = None
+
+PAGE = b'<html><head><script src="/js/jquery-3.5.1.min.js"></script></head><body>Hello</body></html>'
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """
+    "/" is a page with a server header and jQuery, "/drip" sends a byte every 10 ms, "/hang" never answers, 
+    "/cookie" sets a cookie, "/echo" returns the cookies it received, "/multi" repeats a header, "/big" is 1 MB long, sent in 64 KB pieces. 
+    Connections are kept alive, and counted. 
+    """
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        Handler.connections += 1
+
+    def do_GET(self):
+        if self.path.startswith('/hang'):
+            time.sleep(5)
+            self.close_connection = True
+            return
+        body = PAGE
+        if self.path.startswith('/echo'):
+            body = self.headers.get('Cookie', '').encode()
+        if self.path.startswith('/big'):
+            body = PAGE + b'x' * 1048576
+        self.send_response(200)
+        self.send_header('Server', 'nginx/1.19.0')
+        self.send_header('Content-Type', 'text/html')
+        if self.path.startswith('/cookie'):
+            self.send_header('Set-Cookie', 'session=secret; Path=/')
+        if self.path.startswith('/multi'):
+            self.send_header('X-Powered-By', 'PHP/8.0.1')
+            self.send_header('X-Powered-By', 'Express')
+        if self.path.startswith('/drip'):
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        else:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            if self.path.startswith('/drip'):
+                for _ in range(1000):
+                    self.wfile.write(b'x')
+                    self.wfile.flush()
+                    time.sleep(0.01)
+            elif self.path.startswith('/big'):
+                for i in range(0, len(body), 65536):
+                    self.wfile.write(body[i:i + 65536])
+                    self.wfile.flush()
+                    time.sleep(0.005)
+            else:
+                self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+class LocalServer:
+
+    def __init__(self) -> None:
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+def fetch(wappalyzer, url:str):
+    """
+    Download the page with aiohttp. 
+    """
+    async def main():
+        try:
+            return await wappalyzer.fetch_async(url)
+        finally:
+            await wappalyzer.aclose()
+    return asyncio.run(main())
+
+def names(techs) -> list:
+    return sorted((t.name, t.version, tuple(t.categories)) for t in techs)
+
+@unittest.skipIf(Wappalyzer is None, "python-Wappalyzer is not installed")
+class PythonBackendTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        warnings.simplefilter('ignore')
+        cls.server = LocalServer()
+        cls.cache = tempfile.TemporaryDirectory()
+        cls.fingerprints = m.FingerprintDB(cache_dir=cls.cache.name, offline=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        cls.cache.cleanup()
+
+    def wappalyzer(self, **options) -> m.PythonWappalyzer:
+        wappalyzer = m.PythonWappalyzer(fingerprints=self.fingerprints, **options)
+        self.addCleanup(wappalyzer.close)
+        return wappalyzer
+
+class TestSession(PythonBackendTestCase):
+
+    def test_connections_reused(self):
+        wappalyzer = self.wappalyzer(pool_size=3)
+        before = Handler.connections
+        with concurrent.futures.ThreadPoolExecutor(3) as executor:
+            pages = list(executor.map(wappalyzer.download, [ self.server.url ] * 30))
+        self.assertEqual([ content for _, content, _ in pages ], [ PAGE ] * 30)
+        self.assertLessEqual(Handler.connections - before, 3)
+
+    def test_cookies_not_shared(self):
+        wappalyzer = self.wappalyzer()
+        wappalyzer.download(self.server.url + '/cookie')
+        self.assertEqual(wappalyzer.download(self.server.url + '/echo')[1], b'')
+
+class TestAsyncFetcher(PythonBackendTestCase):
+
+    def test_same_as_requests(self):
+        wappalyzer = self.wappalyzer()
+        for path in ('/', '/multi', '/echo'):
+            url, content, headers = wappalyzer.download(self.server.url + path)
+            async_url, async_content, async_headers = fetch(wappalyzer, self.server.url + path)
+            self.assertEqual((async_url, async_content), (url, content))
+            for name in ('Server', 'X-Powered-By'):
+                self.assertEqual(async_headers.get(name), headers.get(name))
+
+    def test_analyze_async(self):
+        wappalyzer = self.wappalyzer()
+        hosts = [ self.server.url + f'/?page={i}' for i in range(10) ]
+        results = m.asyncio_do(wappalyzer.analyze_async, hosts, workers=5, finalize=wappalyzer.aclose)
+        self.assertEqual([ names(techs) for techs in results ], [ names(wappalyzer.analyze(host)) for host in hosts ])
+        self.assertIn(('jQuery', '3.5.1', ('JavaScript libraries',)), names(results[0]))
+
+    def test_failures(self):
+        wappalyzer = self.wappalyzer()
+        for url in ('http://127.0.0.1:1/', 'http://[invalid/'):
+            with self.assertRaises(m.AnalysisError):
+                fetch(wappalyzer, url)
+
+class TestProcesses(PythonBackendTestCase):
+
+    def test_same_as_threads(self):
+        threads, processes = self.wappalyzer(), self.wappalyzer(processes=2)
+        hosts = [ self.server.url + path for path in ('/', '/multi', '/echo') ]
+        pages = [ threads.download(host) for host in hosts ]
+        expected = [ names(threads.analyze_page(host, page)) for host, page in zip(hosts, pages) ]
+        self.assertIn(('jQuery', '3.5.1', ('JavaScript libraries',)), expected[0])
+        self.assertEqual([ names(processes.analyze_page(host, page)) for host, page in zip(hosts, pages) ], expected)
+        self.assertEqual([ names(techs) for techs in processes.analyze_pages(hosts, pages) ], expected)
+        results = m.asyncio_do(processes.analyze_async, hosts, workers=3, finalize=processes.aclose)
+        self.assertEqual([ names(techs) for techs in results ], expected)
+
+class TestBatched(PythonBackendTestCase):
+
+    def overlap(self, wappalyzer:m.PythonWappalyzer, hosts:list) -> Tuple[list, int]:
+        """
+        Analyze the hosts with 4 threads, return the results and the most batches analyzed at the same time. 
+        """
+        running, most = [], []
+        lock = threading.Lock()
+        detect_many = wappalyzer.detect_many
+        def slow(index, pages):
+            with lock:
+                running.append(1)
+                most.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+            return detect_many(index, pages)
+        wappalyzer.detect_many = slow
+        return m.async_do(wappalyzer.analyze, hosts, asynch=True, workers=4), max(most)
+
+    def check(self, regex_engine:str) -> int:
+        hosts = [ self.server.url + f'/?page={i}' for i in range(16) ]
+        expected = [ names(self.wappalyzer().analyze(host)) for host in hosts ]
+        results, most = self.overlap(self.wappalyzer(regex_engine=regex_engine, analyze_batch=8, workers=4), hosts)
+        self.assertEqual([ names(techs) for techs in results ], expected)
+        return most
+
+    @unittest.skipIf(m.re2 is None, "google-re2 is not installed")
+    def test_threads_overlap(self):
+        # re2 matches without the GIL: each thread analyzes its own batch
+        self.assertGreater(self.check('re2'), 1)
+
+    def test_one_batch_at_a_time_with_re(self):
+        self.assertEqual(self.check('re'), 1)
+
+class TestLimits(PythonBackendTestCase):
+
+    def test_max_body(self):
+        wappalyzer = self.wappalyzer(max_body=1000)
+        for url, content, headers in (wappalyzer.download(self.server.url + '/big'), fetch(wappalyzer, self.server.url + '/big')):
+            self.assertEqual(content, (PAGE + b'x' * 1000)[:1000])
+        self.assertEqual(wappalyzer.truncated, {self.server.url + '/big': 'size limit'})
+        # Analyzed on what was received
+        self.assertIn('jQuery', [ t.name for t in wappalyzer.analyze(self.server.url + '/big') ])
+
+    def test_exact_max_body(self):
+        wappalyzer = self.wappalyzer(max_body=len(PAGE))
+        for url, content, headers in (wappalyzer.download(self.server.url), fetch(wappalyzer, self.server.url)):
+            self.assertEqual(content, PAGE)
+        # Complete, not truncated
+        self.assertEqual(wappalyzer.truncated, {})
+        wappalyzer.download(self.server.url + '/big')
+        self.assertEqual(wappalyzer.truncated, {self.server.url + '/big': 'size limit'})
+
+    def test_no_limit(self):
+        wappalyzer = self.wappalyzer(max_body=0, max_read_time=0)
+        self.assertEqual(len(wappalyzer.download(self.server.url + '/big')[1]), len(PAGE) + 1048576)
+        self.assertEqual(wappalyzer.truncated, {})
+
+class TestStreamMatcher(PythonBackendTestCase):
+
+    def test_feed(self):
+        matcher = m.StreamMatcher(m.LiteralScanner(['jquery', 'wordpress', 'drupal']), idle=100)
+        self.assertTrue(matcher.feed(b'<script src="jQuery.js">'))
+        self.assertTrue(matcher.feed(b'x' * 60))
+        # Found across two chunks
+        self.assertTrue(matcher.feed(b'<!-- word'))
+        self.assertTrue(matcher.feed(b'press -->' + b'x' * 90))
+        self.assertEqual(matcher.seen, {'jquery', 'wordpress'})
+        # Literals already seen don't count
+        self.assertFalse(matcher.feed(b'jquery wordpress' + b'x' * 90))
+
+    def test_early_stop(self):
+        wappalyzer = self.wappalyzer(max_body=0, stream_idle=65536)
+        for url, content, headers in (wappalyzer.download(self.server.url + '/big'), fetch(wappalyzer, self.server.url + '/big')):
+            self.assertTrue(content.startswith(PAGE))
+            self.assertLess(len(content), 1048576)
+        self.assertEqual(wappalyzer.truncated, {self.server.url + '/big': 'early stop'})
+        self.assertIn('jQuery', [ t.name for t in wappalyzer.analyze(self.server.url + '/big') ])
+
+    def test_disabled(self):
+        wappalyzer = self.wappalyzer(max_body=0, stream_idle=0)
+        self.assertEqual(len(wappalyzer.download(self.server.url + '/big')[1]), len(PAGE) + 1048576)
+        self.assertEqual(wappalyzer.truncated, {})
+
+class TestTimeouts(PythonBackendTestCase):
+
+    def test_ceilings_from_timeout(self):
+        wappalyzer = self.wappalyzer(timeout=60)
+        self.assertEqual([ wappalyzer.timeouts.get(phase) for phase in ('connect', 'first_byte', 'total') ], [10, 10, 60])
+        wappalyzer.set_longest_timeouts()
+        self.assertEqual([ wappalyzer.timeouts.get(phase) for phase in ('connect', 'first_byte', 'total') ], [60, 60, 60])
+        self.assertEqual(self.wappalyzer(timeout=5).timeouts.get('connect'), 5)
+
+    def test_phases_observed(self):
+        wappalyzer = self.wappalyzer()
+        wappalyzer.download(self.server.url)
+        fetch(wappalyzer, self.server.url)
+        self.assertEqual({ phase: sketch.count for phase, sketch in wappalyzer.timeouts.sketches.items() }, 
+            {'connect': 2, 'first_byte': 2, 'total': 2})
+
+    def test_total_enforced(self):
+        wappalyzer = self.wappalyzer(timeout=1, max_read_time=0)
+        began = time.monotonic()
+        with self.assertRaises(m.AnalysisTimeout):
+            wappalyzer.download(self.server.url + '/drip')
+        with self.assertRaises(m.AnalysisTimeout):
+            fetch(wappalyzer, self.server.url + '/drip')
+        self.assertLess(time.monotonic() - began, 4)
+        self.assertEqual(wappalyzer.truncated, {})
+
+    def test_read_time_before_total(self):
+        wappalyzer = self.wappalyzer(timeout=5, max_read_time=0.5)
+        for url, content, headers in (wappalyzer.download(self.server.url + '/drip'), 
+                fetch(wappalyzer, self.server.url + '/drip')):
+            self.assertLess(len(content), 1000)
+        self.assertEqual(wappalyzer.truncated, {self.server.url + '/drip': 'time limit'})
+
+    def test_first_byte_timeout(self):
+        wappalyzer = self.wappalyzer(timeout=1)
+        with self.assertRaises(m.AnalysisTimeout):
+            wappalyzer.download(self.server.url + '/hang')
+
+class TestHedged(PythonBackendTestCase):
+
+    def test_pipeline(self):
+        scan = m.MassWappalyzer([ self.server.url ], self.cache.name + '/out', engine='pipeline', python=True, hedge=5, 
+            cache_dir=self.cache.name, offline=True)
+        self.addCleanup(scan.analyzer.close)
+        self.assertEqual(scan.engine, 'pipeline')
+        techs, = scan._analyze([ self.server.url ])
+        self.assertTrue({'Nginx', 'jQuery'} <= { t.name for t in techs })
+
+if __name__ == '__main__':
+    unittest.main()
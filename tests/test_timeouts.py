@@ -0,0 +1,60 @@
+"""
+Tests of the timeouts learned from the observed latencies.
+Run with: python -m unittest discover tests
+"""
+import random
+import unittest
+
+import masswappalyzer as m
+
+class TestLatencySketch(unittest.TestCase):
+
+    def test_quantiles(self):
+        sketch = m.LatencySketch()
+        self.assertIsNone(sketch.quantile(0.5))
+        rnd = random.Random(0)
+        latencies = sorted(rnd.expovariate(1) for _ in range(10000))
+        for latency in latencies:
+            sketch.add(latency)
+        for q in (0.5, 0.9, 0.99):
+            expected = latencies[int(q * len(latencies)) - 1]
+            self.assertLessEqual(abs(sketch.quantile(q) - expected) / expected, 0.05 + 0.01)
+
+class TestTimeoutPolicy(unittest.TestCase):
+
+    def test_not_adaptive(self):
+        policy = m.TimeoutPolicy(ceilings={'total': 100}, initial={'total': 10})
+        for _ in range(100):
+            policy.observe('total', 1)
+        self.assertEqual(policy.get('total'), 10)
+
+    def test_adaptive(self):
+        policy = m.TimeoutPolicy(ceilings={'connect': 100, 'total': 100}, floors={'total': 5}, initial={'total': 10}, 
+            adaptive=True, min_samples=20)
+        for _ in range(19):
+            policy.observe('total', 1)
+        self.assertEqual(policy.get('total'), 10)
+        policy.observe('total', 1)
+        # p99 x 3, at least the floor
+        self.assertEqual(policy.get('total'), 5)
+        for _ in range(100):
+            policy.observe('total', 20)
+        self.assertAlmostEqual(policy.get('total'), 60, delta=3)
+        for _ in range(100):
+            policy.observe('total', 50)
+        self.assertEqual(policy.get('total'), 100)
+        # Phases are learned separately
+        self.assertEqual(policy.get('connect'), 100)
+        # Unknown phases are ignored
+        policy.observe('first_byte', 1)
+
+    def test_longest(self):
+        policy = m.TimeoutPolicy(ceilings={'connect': 60}, initial={'connect': 10}, adaptive=True)
+        for _ in range(20):
+            policy.observe('connect', 0.1)
+        self.assertLess(policy.get('connect'), 10)
+        policy.set_longest()
+        self.assertEqual(policy.get('connect'), 60)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Differential tests of the extraction of the scripts and meta tags of the pages (FastWebPage) against python-Wappalyzer's
+WebPage, on random HTML fragments.
+Run with: python -m unittest discover tests
+"""
+import random
+import unittest
+import warnings
+
+import masswappalyzer as m
+
+try:
+    import Wappalyzer
+    import requests
+except ImportError:
+    Wappalyzer = None
+
+FRAGMENTS = ['<script src="%s"></script>', '<SCRIPT SRC=%s>', "<script src='%s' async>", '<meta name="%s" content="%s">',
+    '<META NAME=%s CONTENT=%s>', '<meta content="%s" name="%s">', '<meta name="%s">', '<!--', '-->', '<![CDATA[', ']]>',
+    '<svg>', '</svg>', '<table>', '<tr><td>', '<select>', '<option>', '<textarea>', '</textarea>', '<noscript>', '</noscript>',
+    '<template>', '</template>', '<iframe>', '</iframe>', '<style>', '</style>', '<title>', '</title>',
+    '<script>var a="<script src=x>";</script>', '<p>', '</p>', '&amp;', '&#0;', '\x00', '﻿', 'é', '<!DOCTYPE html>',
+    '<html>', '<head>', '</head>', '<body>', '</body>', '</html>', '<plaintext>', '<xmp>', '</xmp>', '<a href="', '">', '<', '>', '"', "'", '=']
+VALUES = ['jquery-3.5.1.min.js', '/wp-content/x.js', 'generator', 'Generator', 'WordPress 5.8', '', 'a b', '"q"', '&lt;', 'é',
+    'x\x00y', 'https://cdn.example/y.js?v=1']
+
+@unittest.skipIf(Wappalyzer is None or m.lxml is None, "python-Wappalyzer or lxml is not installed")
+class TestFastWebPage(unittest.TestCase):
+
+    def test_page(self):
+        html = '<html><head><meta name="generator" content="Caf\u00e9 CMS"></head></html>'
+        page = m.PythonWappalyzer.page('http://site.example/', html.encode('latin-1'), 
+            requests.structures.CaseInsensitiveDict({'Content-Type': 'text/html; charset=iso-8859-1'}))
+        self.assertIsInstance(page, m.FastWebPage)
+        self.assertEqual(page.meta, {'generator': 'Caf\u00e9 CMS'})
+
+    def test_scripts_and_meta(self):
+        warnings.simplefilter('ignore')
+        rnd = random.Random(1)
+        for _ in range(1000):
+            html = ''
+            for _ in range(rnd.randint(0, 60)):
+                fragment = rnd.choice(FRAGMENTS)
+                html += fragment % tuple(rnd.choice(VALUES) for _ in range(fragment.count('%s')))
+                if rnd.random() < 0.3:
+                    html += 'text '
+            expected = Wappalyzer.WebPage('http://site.example/', html, {})
+            page = m.FastWebPage('http://site.example/', html, {})
+            self.assertEqual((page.scripts, page.meta), (expected.scripts, expected.meta), html)
+
+if __name__ == '__main__':
+    unittest.main()